@@ -57,6 +57,8 @@ def run_tests(test_type="all"):
         cmd = [
             "pytest",
             "tests/unit/",
+            "-n", "auto",
+            "--dist", "loadfile",
             "-v",
             "--alluredir=allure-results"
         ]
@@ -64,6 +66,8 @@ def run_tests(test_type="all"):
         cmd = [
             "pytest",
             "tests/api/",
+            "-n", "auto",
+            "--dist", "loadfile",
             "-v",
             "--alluredir=allure-results"
         ]
@@ -72,6 +76,8 @@ def run_tests(test_type="all"):
         cmd = [
             "pytest",
             "tests/integration/",
+            "-n", "auto",
+            "--dist", "loadscope",
             "-v",
             "--alluredir=allure-results"
         ]
@@ -11,15 +11,55 @@ from tenacity import (
     wait_exponential,
     retry_if_exception_type,
 )
+import threading
 import time
 
 logger = logging.getLogger(__name__)
 
+try:  # HTTP/2 needs the optional "h2" package (pip install httpx[http2])
+    import h2  # noqa: F401
+
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+try:  # orjson parses straight from bytes, ~2-3x faster than stdlib json
+    import orjson
+except ImportError:
+    orjson = None
+
+# Constant query parameters, JSON-encoded once instead of on every request
+_BIN_FIELDS = json.dumps(["actual_qty", "reserved_qty", "projected_qty", "warehouse"])
+_OPEN_PO_FILTERS = json.dumps(
+    [["docstatus", "=", 1], ["status", "in", ["To Receive and Bill", "To Receive"]]]
+)
+_OPEN_PO_FIELDS = json.dumps(["name", "schedule_date", "items", "supplier", "status"])
+_SALES_ORDER_LIST_FIELDS = json.dumps(
+    ["name", "customer", "transaction_date", "delivery_date", "status", "grand_total"]
+)
+
+
+def _parse_json(response: httpx.Response) -> Any:
+    """Decode a JSON response body, using orjson when it is installed."""
+    content = response.content
+    if orjson is not None and isinstance(content, bytes):
+        return orjson.loads(content)
+    return response.json()
+
 
 class ERPNextClientError(Exception):
     """Base exception for ERPNext client errors."""
 
-    pass
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        """
+        Initialize error.
+
+        Args:
+            message: Error description
+            status_code: HTTP status ERPNext answered with, when the error came from one
+        """
+        super().__init__(message)
+        self.status_code = status_code
 
 
 class CircuitBreaker:
@@ -72,6 +112,38 @@ class CircuitBreaker:
 
 _circuit_breaker = CircuitBreaker(failure_threshold=5, timeout=60)
 
+# Process-wide pooled HTTP client. ERPNextClient is built per request, so sharing
+# one httpx.Client keeps TCP/TLS connections alive across requests.
+_global_client: Optional[httpx.Client] = None
+_global_client_lock = threading.Lock()
+
+
+def get_global_client() -> httpx.Client:
+    """Return the shared pooled httpx.Client, creating it on first use."""
+    global _global_client
+    if _global_client is None or _global_client.is_closed:
+        with _global_client_lock:
+            if _global_client is None or _global_client.is_closed:
+                _global_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_keepalive_connections=32,
+                        max_connections=64,
+                        keepalive_expiry=30.0,
+                    ),
+                    timeout=httpx.Timeout(30.0, connect=10.0, read=30.0, write=10.0),
+                    http2=_HTTP2_AVAILABLE,
+                )
+    return _global_client
+
+
+def close_global_client() -> None:
+    """Close the shared httpx.Client (e.g. on application shutdown)."""
+    global _global_client
+    with _global_client_lock:
+        if _global_client is not None:
+            _global_client.close()
+            _global_client = None
+
 
 class ERPNextClient:
     """
@@ -97,17 +169,8 @@ class ERPNextClient:
         self.api_secret = api_secret or settings.erpnext_api_secret
         self.timeout = timeout
 
-        # Create a dedicated httpx.Client per instance for thread safety
-        limits = httpx.Limits(
-            max_keepalive_connections=10,
-            max_connections=20,
-            keepalive_expiry=30.0,
-        )
-        self.client = httpx.Client(
-            limits=limits,
-            timeout=httpx.Timeout(self.timeout, connect=10.0, read=30.0, write=10.0),
-            http2=False,
-        )
+        # Reuse the process-wide pooled client (httpx.Client is thread-safe)
+        self.client = get_global_client()
         self.auth_header = f"token {self.api_key}:{self.api_secret}"
 
     def _get_headers(self) -> Dict[str, str]:
@@ -152,7 +215,10 @@ class ERPNextClient:
                 kwargs["headers"] = {}
             kwargs["headers"].update(self._get_headers())
 
-            # Make request (per-instance client is thread-safe)
+            # Honour this instance's timeout on the shared pooled client
+            kwargs.setdefault(
+                "timeout", httpx.Timeout(self.timeout, connect=10.0, read=30.0, write=10.0)
+            )
             response = self.client.request(method, url, **kwargs)
 
             # Check for HTTP errors (4xx and 5xx)
@@ -170,12 +236,15 @@ class ERPNextClient:
         except httpx.HTTPStatusError as e:
             _circuit_breaker.record_failure()
             logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
-            raise ERPNextClientError(f"HTTP {e.response.status_code}: {e.response.text}") from e
+            raise ERPNextClientError(
+                f"HTTP {e.response.status_code}: {e.response.text}",
+                status_code=e.response.status_code,
+            ) from e
 
     def _handle_response(self, response: httpx.Response) -> Dict[str, Any]:
         """Handle HTTP response and errors."""
         try:
-            data = response.json()
+            data = _parse_json(response)
 
             # ERPNext wraps responses in different ways
             if isinstance(data, dict):
@@ -193,7 +262,10 @@ class ERPNextClient:
             raise
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error: {e.response.status_code} - {e.response.text}")
-            raise ERPNextClientError(f"HTTP {e.response.status_code}: {e.response.text}") from e
+            raise ERPNextClientError(
+                f"HTTP {e.response.status_code}: {e.response.text}",
+                status_code=e.response.status_code,
+            ) from e
         except httpx.TimeoutException as e:
             logger.error(f"Request timeout: {e}")
             raise ERPNextClientError("Request to ERPNext timed out") from e
@@ -230,7 +302,7 @@ class ERPNextClient:
         """
         params = {
             "filters": json.dumps([["item_code", "=", item_code], ["warehouse", "=", warehouse]]),
-            "fields": json.dumps(["actual_qty", "reserved_qty", "projected_qty", "warehouse"]),
+            "fields": _BIN_FIELDS,
         }
 
         url = f"{self.base_url}/api/resource/Bin"
@@ -302,11 +374,8 @@ class ERPNextClient:
             }
         """
         params = {
-            "filters": json.dumps([
-                ["docstatus", "=", 1],
-                ["status", "in", ["To Receive and Bill", "To Receive"]],
-            ]),
-            "fields": json.dumps(["name", "schedule_date", "items", "supplier", "status"]),
+            "filters": _OPEN_PO_FILTERS,
+            "fields": _OPEN_PO_FIELDS,
             "order_by": "schedule_date asc",
             "limit_page_length": 100,
         }
@@ -402,16 +471,7 @@ class ERPNextClient:
         # The doctype is already in the URL path: /api/resource/Sales Order
         params: Dict[str, Any] = {
             "filters": json.dumps(filters),
-            "fields": json.dumps(
-                [
-                    "name",
-                    "customer",
-                    "transaction_date",
-                    "delivery_date",
-                    "status",
-                    "grand_total",
-                ]
-            ),
+            "fields": _SALES_ORDER_LIST_FIELDS,
             "order_by": "transaction_date desc",
             "limit_page_length": min(limit, 100),
             "limit_start": offset,
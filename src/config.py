@@ -31,6 +31,12 @@ class Settings(BaseSettings):
     processing_lead_time_days_default: int = 1
     delivery_model: str = "latest_acceptable"
 
+    # Stock/supply lookup caching (seconds; 0 disables)
+    stock_cache_ttl: int = 30
+    stock_cache_negative_ttl: int = 5
+    # Skip PO lookups for this long after ERPNext answers 403 (seconds; 0 disables)
+    po_permission_denied_ttl: int = 60
+
     # Mock Supply Configuration (for testing/demo)
     use_mock_supply: bool = False
     mock_data_file: str = "data/mock_supply.json"
@@ -5,7 +5,7 @@ from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from src.routes import otp, items
 from src.models.response_models import HealthResponse
-from src.clients.erpnext_client import ERPNextClient
+from src.clients.erpnext_client import ERPNextClient, close_global_client
 from src.config import settings
 
 # Configure logging
@@ -108,8 +108,7 @@ async def startup_event():
         f"API Documentation: http://{settings.otp_service_host}:{settings.otp_service_port}/docs"
     )
 
-    # No global HTTP client initialization needed; clients are now per-instance and thread-safe
-    logger.info("HTTP client is now per-instance and thread-safe; no global pool initialized.")
+    # The shared pooled HTTP client is created lazily on first ERPNext request
 
     # Log all registered routes for debugging
     logger.info("\n=== Registered Routes ===")
@@ -125,8 +124,8 @@ async def startup_event():
 async def shutdown_event():
     """Application shutdown tasks."""
     logger.info("Shutting down OTP Service...")
-    # No global HTTP client to close; clients are now per-instance
-    logger.info("No global HTTP client to close; clients are per-instance.")
+    close_global_client()
+    logger.info("Closed shared ERPNext HTTP client.")
 
 
 # Diagnostics endpoint
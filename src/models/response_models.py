@@ -172,3 +172,13 @@ class SalesOrderDetailsResponse(BaseModel):
     grand_total: Optional[float] = Field(None, description="Total order amount")
     items: List[SalesOrderDetailItem] = Field(..., description="Sales Order items")
     defaults: SalesOrderDefaults = Field(..., description="Default UI settings")
+
+
+class ItemStockResponse(BaseModel):
+    """Warehouse-specific stock levels for one item."""
+
+    item_code: str = Field(..., description="Item code")
+    warehouse: str = Field(..., description="Warehouse name")
+    stock_actual: float = Field(..., description="Actual stock quantity")
+    stock_reserved: float = Field(..., description="Reserved stock quantity")
+    stock_available: float = Field(..., description="Available stock (actual - reserved)")
@@ -3,6 +3,7 @@ from fastapi import APIRouter, HTTPException, Query
 import logging
 from typing import Dict, Any
 from src.clients.erpnext_client import ERPNextClient, ERPNextClientError
+from src.models.response_models import ItemStockResponse
 
 logger = logging.getLogger(__name__)
 
@@ -86,7 +87,7 @@ def get_item_stock(
         raise HTTPException(status_code=500, detail=f"Failed to fetch stock data: {str(e)}")
 
 
-@router.get("/stock")
+@router.get("/stock", response_model=ItemStockResponse)
 async def get_stock(
     item_code: str = Query(..., description="Item code to fetch stock for"),
     warehouse: str = Query(..., description="Warehouse name"),
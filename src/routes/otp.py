@@ -1,8 +1,10 @@
 """API routes for OTP endpoints."""
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+import hashlib
+import json
 import logging
-import time
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional
 from src.models.request_models import (
     PromiseRequest,
     ApplyPromiseRequest,
@@ -20,18 +22,19 @@ from src.models.response_models import (
 )
 from src.controllers.otp_controller import OTPController
 from src.services.promise_service import PromiseService
-from src.services.stock_service import StockService
+from src.services.stock_service import StockService, shared_stock_cache
 from src.services.mock_supply_service import MockSupplyService
 from src.services.apply_service import ApplyService
 from src.clients.erpnext_client import ERPNextClient, ERPNextClientError
 from src.config import settings
+from src.utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/otp", tags=["OTP"])
 
 _SALES_ORDER_CACHE_TTL_SECONDS = 300
-_sales_orders_cache: Dict[Tuple[Any, ...], Dict[str, Any]] = {}
+_sales_orders_cache = TTLCache(maxsize=256, ttl=_SALES_ORDER_CACHE_TTL_SECONDS)
 
 
 def _map_erpnext_error_to_http(e: ERPNextClientError) -> HTTPException:
@@ -51,7 +54,7 @@ def get_controller(client: ERPNextClient = Depends(get_erpnext_client)) -> OTPCo
     if settings.use_mock_supply:
         stock_service = MockSupplyService(settings.mock_data_file)
     else:
-        stock_service = StockService(client)
+        stock_service = StockService(client, cache=shared_stock_cache)
     promise_service = PromiseService(stock_service)
     apply_service = ApplyService(client)
     return OTPController(promise_service, apply_service)
@@ -177,8 +180,34 @@ async def health_check() -> HealthResponse:
         )
 
 
+def _sales_orders_etag(items: List[SalesOrderItem]) -> str:
+    """Strong ETag for a sales-orders payload (hash of its canonical JSON)."""
+    payload = json.dumps(jsonable_encoder(items), sort_keys=True, separators=(",", ":"))
+    return '"' + hashlib.blake2b(payload.encode(), digest_size=16).hexdigest() + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header (weak comparison, lists and "*" allowed)."""
+    if not if_none_match:
+        return False
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _conditional_sales_orders(
+    http_request: Request, response: Response, items: List[SalesOrderItem], etag: str
+):
+    """Tag items with their ETag, or answer 304 if the client already has this version."""
+    if _etag_matches(http_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return items
+
+
 @router.get("/sales-orders", response_model=List[SalesOrderItem])
 async def list_sales_orders(
+    http_request: Request,
+    response: Response,
     client: ERPNextClient = Depends(get_erpnext_client),
     limit: int = Query(20, ge=1, le=100, description="Maximum number of results"),
     offset: int = Query(0, ge=0, description="Number of records to skip for pagination"),
@@ -221,16 +250,19 @@ async def list_sales_orders(
     ]
     ```
 
+    Responses carry an ETag; a request whose If-None-Match matches it gets an
+    empty 304 Not Modified instead of the list.
+
     Errors:
     - 502: ERPNext returned error (see detail field)
     - 500: Internal server error
     """
     cache_key = (limit, offset, customer, status, from_date, to_date, search)
     cached = _sales_orders_cache.get(cache_key)
-    now = time.time()
-    if cached and cached["expires_at"] > now:
+    if cached is not None:
         logger.info("[OTP API] Returning cached sales orders")
-        return cached["data"]
+        items, etag = cached
+        return _conditional_sales_orders(http_request, response, items, etag)
 
     try:
         logger.info(
@@ -261,13 +293,12 @@ async def list_sales_orders(
                 )
             )
 
-        _sales_orders_cache[cache_key] = {
-            "data": items,
-            "expires_at": now + _SALES_ORDER_CACHE_TTL_SECONDS,
-        }
+        # Hash once per fetch; cache hits reuse the stored ETag
+        etag = _sales_orders_etag(items)
+        _sales_orders_cache[cache_key] = (items, etag)
 
         logger.info(f"[OTP API] Retrieved {len(items)} sales orders")
-        return items
+        return _conditional_sales_orders(http_request, response, items, etag)
 
     except ERPNextClientError as e:
         logger.error(f"[OTP API] ERPNext error: {e}")
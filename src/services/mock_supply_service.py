@@ -7,6 +7,8 @@ from datetime import date, datetime
 from pathlib import Path
 from typing import Dict, Optional
 
+from src.services.stock_service import IncomingSupply, StockLevels
+
 logger = logging.getLogger(__name__)
 
 
@@ -159,7 +161,7 @@ class MockSupplyService:
 
     def get_available_stock(
         self, item_code: str, warehouse: Optional[str] = None
-    ) -> Dict[str, float]:
+    ) -> StockLevels:
         all_matches = self.stock_index.get(item_code.lower(), [])
         matches = all_matches
 
@@ -181,7 +183,9 @@ class MockSupplyService:
             "available_qty": projected,
         }
 
-    def get_incoming_supply(self, item_code: str, after_date: Optional[date] = None) -> Dict:
+    def get_incoming_supply(
+        self, item_code: str, after_date: Optional[date] = None
+    ) -> IncomingSupply:
         """
         Get incoming supply from mock PO data.
 
@@ -1,4 +1,5 @@
 """Core promise calculation service."""
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
 from datetime import date, datetime, timedelta
 import pytz
@@ -16,6 +17,9 @@ from src.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on concurrent stock lookups when prefetching a multi-line order
+_STOCK_PREFETCH_MAX_WORKERS = 4
+
 
 class PromiseService:
     """
@@ -189,12 +193,15 @@ class PromiseService:
         latest_fulfillment_date = base_today
         has_po_access_error = False
         all_item_reasons = []
+        # Memoizes stock/supply lookups for the duration of this computation
+        request_cache: Dict[tuple, Any] = {}
+        self._prefetch_stock(items, request_cache)
 
         # Step 1: Build fulfillment plan for each item
         for item in items:
             warehouse = item.warehouse or settings.default_warehouse
             item_plan, po_access_error, item_reasons = self._build_item_plan(
-                item, warehouse, base_today, rules, today
+                item, warehouse, base_today, rules, today, request_cache
             )
             plan.append(item_plan)
             all_item_reasons.extend(item_reasons)
@@ -286,13 +293,17 @@ class PromiseService:
         today: date,
         rules: PromiseRules = None,
         original_today: date = None,
+        request_cache: Optional[Dict[tuple, Any]] = None,
     ) -> tuple:
         """
         Build fulfillment plan for a single item. Note: Pass original_today for PO filtering.
 
+        Pass request_cache to share stock/supply lookups across items of one order.
+
         Strategy:
         1. Classify warehouse and handle accordingly
-        2. Use available stock from SELLABLE/NEEDS_PROCESSING warehouses
+        2. Use available stock from SELLABLE/NEEDS_PROCESSING warehouses (a GROUP counts
+           its SELLABLE/NEEDS_PROCESSING children's total, with processing time)
         3. Ignore IN_TRANSIT and NOT_AVAILABLE warehouse stock
         4. Use incoming POs for future supply
         5. Add processing lead time to each fulfillment source
@@ -316,7 +327,13 @@ class PromiseService:
 
         # Get available stock - behavior depends on warehouse type
         logger.debug(f"Looking up stock for {item.item_code} in warehouse '{warehouse}'")
-        stock = self.stock_service.get_available_stock(item.item_code, warehouse)
+        stock = self._cached_lookup(
+            request_cache,
+            ("stock", item.item_code, warehouse),
+            self.stock_service.get_available_stock,
+            item.item_code,
+            warehouse,
+        )
         logger.debug(f"Stock result: {stock}")
         available_stock = stock["available_qty"]
 
@@ -343,8 +360,15 @@ class PromiseService:
                 qty_needed -= qty_from_stock
                 reasons.append(f"{qty_from_stock} units from {warehouse} (ready to ship)")
 
-            elif warehouse_type == WarehouseType.NEEDS_PROCESSING:
+            elif warehouse_type in (WarehouseType.NEEDS_PROCESSING, WarehouseType.GROUP):
                 # NEEDS_PROCESSING: Stock needs additional processing
+                # GROUP: Stock is the total of its SELLABLE/NEEDS_PROCESSING children; which
+                # child holds it isn't known here, so conservatively allow for processing
+                if warehouse_type == WarehouseType.GROUP:
+                    logger.warning(
+                        f"Group warehouse '{warehouse}' passed to _build_item_plan; "
+                        f"planning from its sellable children's total"
+                    )
                 qty_from_stock = min(available_stock, qty_needed)
                 available_date = today
                 # Add extra processing time for this warehouse type
@@ -363,10 +387,16 @@ class PromiseService:
                     )
                 )
                 qty_needed -= qty_from_stock
-                reasons.append(
-                    f"{qty_from_stock} units from {warehouse} "
-                    f"(requires +{processing_days - lead_time_days} day processing)"
-                )
+                if warehouse_type == WarehouseType.GROUP:
+                    reasons.append(
+                        f"Group warehouse {warehouse}: {qty_from_stock} units from its sellable "
+                        f"children (allowing +{processing_days - lead_time_days} day processing)"
+                    )
+                else:
+                    reasons.append(
+                        f"{qty_from_stock} units from {warehouse} "
+                        f"(requires +{processing_days - lead_time_days} day processing)"
+                    )
 
             elif warehouse_type == WarehouseType.IN_TRANSIT:
                 # IN_TRANSIT: Do not count as available now
@@ -384,18 +414,15 @@ class PromiseService:
                     f"{available_stock} units in {warehouse} not available for fulfillment"
                 )
 
-            elif warehouse_type == WarehouseType.GROUP:
-                # GROUP: Should have been expanded before calling this method
-                logger.warning(
-                    f"Group warehouse '{warehouse}' passed to _build_item_plan; should expand first"
-                )
-                reasons.append(f"Group warehouse {warehouse} must be expanded to children")
-
         # If still need more, check incoming POs
         po_access_error = None
         if qty_needed > 0:
-            incoming_result = self.stock_service.get_incoming_supply(
-                item.item_code, after_date=filter_date
+            incoming_result = self._cached_lookup(
+                request_cache,
+                ("supply", item.item_code, filter_date),
+                self.stock_service.get_incoming_supply,
+                item.item_code,
+                after_date=filter_date,
             )
 
             # Check for access errors (permission denied)
@@ -461,6 +488,37 @@ class PromiseService:
 
         return item_plan, po_access_error, reasons
 
+    def _prefetch_stock(self, items: List[ItemRequest], request_cache: Dict[tuple, Any]) -> None:
+        """Fetch stock for every distinct (item, warehouse) line concurrently.
+
+        Results land in request_cache under the keys _build_item_plan uses, so the
+        per-item loop then runs without waiting on ERPNext round-trips one by one.
+        """
+        pairs = list(
+            dict.fromkeys(
+                (item.item_code, item.warehouse or settings.default_warehouse) for item in items
+            )
+        )
+        if len(pairs) < 2:
+            return
+
+        workers = min(_STOCK_PREFETCH_MAX_WORKERS, len(pairs))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(lambda pair: self.stock_service.get_available_stock(*pair), pairs)
+            for (item_code, warehouse), stock in zip(pairs, results):
+                request_cache[("stock", item_code, warehouse)] = stock
+
+    @staticmethod
+    def _cached_lookup(
+        request_cache: Optional[Dict[tuple, Any]], key: tuple, fetch, *args, **kwargs
+    ) -> Any:
+        """Call fetch(*args, **kwargs) once per key within a single promise computation."""
+        if request_cache is None:
+            return fetch(*args, **kwargs)
+        if key not in request_cache:
+            request_cache[key] = fetch(*args, **kwargs)
+        return request_cache[key]
+
     def _apply_business_rules(self, base_date: date, rules: PromiseRules, today: date) -> date:
         """
         Apply business rules to determine final promise date.
@@ -736,20 +794,22 @@ class PromiseService:
 
         # If we missed desired_date, add split shipment option
         if missed_desired and len(plan) > 0:
-            # Check if any items can ship earlier
-            in_stock_items = [
-                p
-                for p in plan
-                if p.shortage == 0 and any(f.source == "stock" for f in p.fulfillment)
-            ]
+            # Check if any items can ship earlier (single pass over the plan)
+            in_stock_items = []
+            earliest_stock_date = None
+            for p in plan:
+                if p.shortage != 0:
+                    continue
+                stock_date = min(
+                    (f.ship_ready_date for f in p.fulfillment if f.source == "stock"),
+                    default=None,
+                )
+                if stock_date is not None:
+                    in_stock_items.append(p)
+                    if earliest_stock_date is None or stock_date < earliest_stock_date:
+                        earliest_stock_date = stock_date
 
             if in_stock_items and len(in_stock_items) < len(plan):
-                earliest_stock_date = min(
-                    f.ship_ready_date
-                    for p in in_stock_items
-                    for f in p.fulfillment
-                    if f.source == "stock"
-                )
                 options.append(
                     PromiseOption(
                         type="split_shipment",
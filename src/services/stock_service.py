@@ -1,25 +1,130 @@
 """Stock service for querying item availability."""
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, TypedDict
 from datetime import date, datetime
 import logging
+import sys
+import time
 from src.clients.erpnext_client import ERPNextClient, ERPNextClientError
+from src.config import settings
+from src.utils.ttl_cache import TTLCache
+from src.utils.warehouse_utils import WarehouseManager, default_warehouse_manager
 
 logger = logging.getLogger(__name__)
 
+# Sort key for PO rows whose schedule_date could not be parsed
+_MAX_ORDINAL = date.max.toordinal() + 1
+
+
+class StockLevels(TypedDict):
+    """Stock quantities returned by get_available_stock."""
+
+    actual_qty: float
+    reserved_qty: float
+    available_qty: float
+
+
+class IncomingSupply(TypedDict):
+    """Result of get_incoming_supply: PO rows sorted by expected date, plus access status."""
+
+    supply: List[Dict[str, Any]]
+    access_error: Optional[str]
+
+
+class _SupplyRow(NamedTuple):
+    """Open PO line; the leading (ordinal, seq) fields make tuples sort by date, stably."""
+
+    ordinal: int
+    seq: int
+    po_id: str
+    qty: float
+    expected_date: Any
+    warehouse: Optional[str]
+
+
+_STOCK_CACHE_MAX_ENTRIES = 10_000
+
+
+class StockLookupCache:
+    """
+    Short-lived caches for StockService lookups, shareable across instances.
+
+    Keyed by (item_code, warehouse) for stock and (item_code, after_date) for
+    incoming supply. Entries are stored with an explicit TTL so settings changes
+    apply without a restart. Values are immutable or copied on the way out, so
+    callers can't alter what other requests see.
+    """
+
+    def __init__(self, maxsize: int = _STOCK_CACHE_MAX_ENTRIES):
+        """Initialize empty stock and supply caches holding up to maxsize entries each."""
+        self.stock = TTLCache(maxsize=maxsize, ttl=settings.stock_cache_ttl)
+        self.supply = TTLCache(maxsize=maxsize, ttl=settings.stock_cache_ttl)
+
+    def clear(self) -> None:
+        """Drop all cached lookups."""
+        self.stock.clear()
+        self.supply.clear()
+
+
+# Cache the API's request handlers share, so sibling requests reuse recent lookups
+shared_stock_cache = StockLookupCache()
+
+# Resource label -> time.monotonic() deadline until which ERPNext is known to answer 403.
+# Permissions are per doctype, not per item, so one 403 covers every item's PO lookup.
+_perm_denied_until: Dict[str, float] = {}
+_PO_RESOURCE = "purchase_order"
+
+# Upper bound on concurrent Bin lookups when summing a group warehouse's children
+_GROUP_FANOUT_MAX_WORKERS = 8
+
+
+def clear_stock_cache() -> None:
+    """Drop the shared stock and incoming-supply lookups and any remembered 403s."""
+    shared_stock_cache.clear()
+    reset_permission_backoff()
+
+
+def reset_permission_backoff() -> None:
+    """Forget remembered 403s so the next PO lookup goes to ERPNext (e.g. after fixing roles)."""
+    _perm_denied_until.clear()
+
 
 class StockService:
-    """Service for stock-related queries."""
+    """Service for stock-related queries.
+
+    Given a StockLookupCache, lookups are kept in its short TTL caches; error
+    results use a shorter TTL so transient failures don't get pinned. Without
+    one, every call queries ERPNext.
+    """
+
+    def __init__(
+        self,
+        erpnext_client: ERPNextClient,
+        warehouse_manager: WarehouseManager = None,
+        cache: Optional[StockLookupCache] = None,
+    ):
+        """
+        Initialize with ERPNext client.
 
-    def __init__(self, erpnext_client: ERPNextClient):
-        """Initialize with ERPNext client."""
+        Args:
+            erpnext_client: ERPNext API client
+            warehouse_manager: Used to expand group warehouses (uses default if not provided)
+            cache: Lookup cache to read and fill, e.g. shared_stock_cache (none if not provided)
+        """
         self.client = erpnext_client
+        self.warehouse_manager = warehouse_manager or default_warehouse_manager
+        self.cache = cache
 
     def get_available_stock(
         self, item_code: str, warehouse: Optional[str] = None
-    ) -> Dict[str, float]:
+    ) -> StockLevels:
         """
         Get available stock for an item.
 
+        A group warehouse (e.g. "All Warehouses - SD") is summed over its SELLABLE and
+        NEEDS_PROCESSING children, which are queried concurrently; WIP, in-transit and
+        other non-sellable children don't count toward its available stock.
+
         Returns:
             {
                 "actual_qty": 10.0,
@@ -27,39 +132,99 @@ class StockService:
                 "available_qty": 8.0
             }
         """
-        try:
-            if warehouse:
-                bin_data = self.client.get_bin_details(item_code, warehouse)
-                logger.info(f"DEBUG: get_bin_details returned: {bin_data}")
-                actual_qty = bin_data.get("actual_qty", 0.0)
-                reserved_qty = bin_data.get("reserved_qty", 0.0)
-                available_qty = actual_qty - reserved_qty
-                logger.info(
-                    f"DEBUG: {item_code} in {warehouse} - actual={actual_qty}, reserved={reserved_qty}, available={available_qty}"
+        # Copy, so callers can't alter the cached figures
+        return dict(self._lookup_stock(item_code, warehouse)[0])
+
+    def _lookup_stock(self, item_code: str, warehouse: Optional[str]) -> Tuple[StockLevels, bool]:
+        """Cached stock lookup; the flag is False when any figure fell back to zero on error."""
+        key = (item_code, warehouse)
+        entry = self.cache.stock.get(key) if self.cache is not None else None
+        if entry is None:
+            try:
+                entry = self._fetch_available_stock(item_code, warehouse)
+            except ERPNextClientError as e:
+                logger.error(f"Failed to get stock for {item_code}: {e}")
+                # Return zero stock on error
+                entry = ({"actual_qty": 0.0, "reserved_qty": 0.0, "available_qty": 0.0}, False)
+            if self.cache is not None:
+                # Incomplete figures are cached briefly so transient failures don't stick
+                ttl = settings.stock_cache_ttl if entry[1] else settings.stock_cache_negative_ttl
+                self.cache.stock.set(key, entry, ttl)
+
+        return entry
+
+    def _fetch_available_stock(
+        self, item_code: str, warehouse: Optional[str] = None
+    ) -> Tuple[StockLevels, bool]:
+        """
+        Query ERPNext for stock levels (raises ERPNextClientError on failure).
+
+        Returns the levels and whether they are complete (False if a group child failed).
+        """
+        if warehouse and self.warehouse_manager.is_group_warehouse(warehouse):
+            children = self.warehouse_manager.expand_warehouse_list([warehouse])
+            if children:
+                return self._fetch_group_stock(
+                    item_code, self.warehouse_manager.filter_available_warehouses(children)
                 )
 
-                return {
-                    "actual_qty": actual_qty,
-                    "reserved_qty": reserved_qty,
-                    "available_qty": max(0.0, available_qty),  # Can't be negative
-                }
-            else:
-                # Get stock across all warehouses (simplified for MVP)
-                # In production, you'd query multiple warehouses
-                stock_data = self.client.get_stock_balance(item_code, warehouse)
-                return {
-                    "actual_qty": stock_data.get("actual_qty", 0.0),
-                    "reserved_qty": stock_data.get("reserved_qty", 0.0),
-                    "available_qty": stock_data.get("available_qty", 0.0),
-                }
-        except ERPNextClientError as e:
-            logger.error(f"Failed to get stock for {item_code}: {e}")
-            # Return zero stock on error
-            return {"actual_qty": 0.0, "reserved_qty": 0.0, "available_qty": 0.0}
+        if warehouse:
+            bin_data = self.client.get_bin_details(item_code, warehouse)
+            actual_qty = bin_data.get("actual_qty", 0.0)
+            reserved_qty = bin_data.get("reserved_qty", 0.0)
+            available_qty = actual_qty - reserved_qty
+            # Hot path: lazy %-formatting, skipped entirely unless DEBUG is enabled
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "%s in %s - actual=%s, reserved=%s, available=%s (bin: %s)",
+                    item_code,
+                    warehouse,
+                    actual_qty,
+                    reserved_qty,
+                    available_qty,
+                    bin_data,
+                )
+
+            return {
+                "actual_qty": actual_qty,
+                "reserved_qty": reserved_qty,
+                "available_qty": max(0.0, available_qty),  # Can't be negative
+            }, True
+
+        # Get stock across all warehouses (simplified for MVP)
+        # In production, you'd query multiple warehouses
+        stock_data = self.client.get_stock_balance(item_code, warehouse)
+        return {
+            "actual_qty": stock_data.get("actual_qty", 0.0),
+            "reserved_qty": stock_data.get("reserved_qty", 0.0),
+            "available_qty": stock_data.get("available_qty", 0.0),
+        }, True
+
+    def _fetch_group_stock(
+        self, item_code: str, warehouses: List[str]
+    ) -> Tuple[StockLevels, bool]:
+        """Sum stock over leaf warehouses, fanning the Bin lookups out over a thread pool.
+
+        Each child goes through the stock cache, and a failing warehouse contributes
+        zero instead of failing the group; the total is then flagged incomplete.
+        """
+        if not warehouses:
+            return {"actual_qty": 0.0, "reserved_qty": 0.0, "available_qty": 0.0}, True
+
+        workers = min(_GROUP_FANOUT_MAX_WORKERS, len(warehouses))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda wh: self._lookup_stock(item_code, wh), warehouses))
+
+        levels = [stock for stock, _ in results]
+        return {
+            "actual_qty": sum(r["actual_qty"] for r in levels),
+            "reserved_qty": sum(r["reserved_qty"] for r in levels),
+            "available_qty": sum(r["available_qty"] for r in levels),
+        }, all(complete for _, complete in results)
 
     def get_incoming_supply(
         self, item_code: str, after_date: Optional[date] = None
-    ) -> Dict[str, any]:
+    ) -> IncomingSupply:
         """
         Get incoming supply from purchase orders (using parent PO doctype).
 
@@ -76,12 +241,46 @@ class StockService:
                 "access_error": None or str  # "permission_denied" or "other_error"
             }
         """
-        result = {"supply": [], "access_error": None}
+        key = (item_code, after_date)
+        entry = self.cache.supply.get(key) if self.cache is not None else None
+        if entry is None:
+            entry = self._fetch_incoming_supply(item_code, after_date)
+            if self.cache is not None:
+                ttl = settings.stock_cache_negative_ttl if entry[1] else settings.stock_cache_ttl
+                self.cache.supply.set(key, entry, ttl)
+
+        rows, access_error = entry
+        # Callers (and MockSupplyService) exchange plain dicts; build fresh ones per
+        # call so the cached rows stay untouched
+        return {
+            "supply": [
+                {
+                    "po_id": row.po_id,
+                    "qty": row.qty,
+                    "expected_date": row.expected_date,
+                    "warehouse": row.warehouse,
+                }
+                for row in rows
+            ],
+            "access_error": access_error,
+        }
+
+    def _fetch_incoming_supply(
+        self, item_code: str, after_date: Optional[date] = None
+    ) -> Tuple[Tuple[_SupplyRow, ...], Optional[str]]:
+        """Query ERPNext for open POs; returns sorted supply rows and the access error, if any."""
+        if time.monotonic() < _perm_denied_until.get(_PO_RESOURCE, 0.0):
+            return (), "permission_denied"
 
         try:
             pos = self.client.get_incoming_purchase_orders(item_code)
 
-            for po in pos:
+            # Rows sort natively as tuples, without a Python key callback
+            rows: List[_SupplyRow] = []
+            # The same few warehouse names (and PO ids across PO lines) recur in every
+            # response; interning shares one string object per name.
+            intern = sys.intern
+            for seq, po in enumerate(pos):
                 schedule_date_str = po.get("schedule_date")
                 if schedule_date_str:
                     if isinstance(schedule_date_str, str):
@@ -97,24 +296,31 @@ class StockService:
                 if after_date and expected_date < after_date:
                     continue
 
-                result["supply"].append(
-                    {
-                        "po_id": po["po_id"],
-                        "qty": po["pending_qty"],
-                        "expected_date": expected_date,
-                        "warehouse": po.get("warehouse"),
-                    }
+                ordinal = (
+                    expected_date.toordinal() if isinstance(expected_date, date) else _MAX_ORDINAL
+                )
+                warehouse = po.get("warehouse")
+                rows.append(
+                    _SupplyRow(
+                        ordinal=ordinal,
+                        seq=seq,
+                        po_id=intern(po["po_id"]),
+                        qty=po["pending_qty"],
+                        expected_date=expected_date,
+                        warehouse=intern(warehouse) if warehouse else warehouse,
+                    )
                 )
 
-            result["supply"].sort(key=lambda x: x["expected_date"])
-            return result
+            rows.sort()
+            return tuple(rows), None
 
         except ERPNextClientError as e:
-            status_code = getattr(e, "status_code", None)
-            if status_code == 403:
-                result["access_error"] = "permission_denied"
+            if e.status_code == 403:
                 logger.warning(f"Permission denied accessing PO data for {item_code}: {e}")
-            else:
-                result["access_error"] = "other_error"
-                logger.error(f"Failed to get incoming supply for {item_code}: {e}")
-            return result
+                if settings.po_permission_denied_ttl > 0:
+                    _perm_denied_until[_PO_RESOURCE] = (
+                        time.monotonic() + settings.po_permission_denied_ttl
+                    )
+                return (), "permission_denied"
+            logger.error(f"Failed to get incoming supply for {item_code}: {e}")
+            return (), "other_error"
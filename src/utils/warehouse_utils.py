@@ -8,9 +8,16 @@ Warehouses represent different inventory availability stages:
 - GROUP: Logical container; must expand to children
 """
 from enum import Enum
-from typing import List, Dict, Set, Optional
+from functools import lru_cache
+from types import MappingProxyType
+from typing import List, Dict, Mapping, Optional, Sequence, Tuple
 import logging
 
+try:  # google-re2 scans all alternatives in one linear-time DFA pass
+    import re2 as re_mod
+except ImportError:
+    import re as re_mod
+
 logger = logging.getLogger(__name__)
 
 
@@ -74,6 +81,73 @@ DEFAULT_WAREHOUSE_HIERARCHY: Dict[str, List[str]] = {
     ],
 }
 
+# Fallback classification for unmapped names: substring rules checked in order, the
+# first rule with a keyword anywhere in the name winning (so "scrapyard" is scrap).
+_PATTERN_RULES: Tuple[Tuple[Tuple[str, ...], WarehouseType], ...] = (
+    (("transit",), WarehouseType.IN_TRANSIT),
+    (("wip", "work in progress"), WarehouseType.NOT_AVAILABLE),
+    (("finished",), WarehouseType.NEEDS_PROCESSING),
+    (("all", "group"), WarehouseType.GROUP),
+    (("scrap", "reject"), WarehouseType.NOT_AVAILABLE),
+)
+
+# One scan for whether any keyword occurs at all; most unmapped names contain none
+_CLASSIFY_RE = re_mod.compile(
+    "|".join(keyword for keywords, _ in _PATTERN_RULES for keyword in keywords)
+)
+
+
+# Bounded so arbitrary warehouse strings from ERPNext or requests can't grow it without limit
+@lru_cache(maxsize=1024)
+def _classify_by_pattern(normalized: str) -> WarehouseType:
+    """Classify a normalized, unmapped warehouse name by the keywords it contains."""
+    if _CLASSIFY_RE.search(normalized):
+        for keywords, wh_type in _PATTERN_RULES:
+            if any(keyword in normalized for keyword in keywords):
+                return wh_type
+
+    # Default to SELLABLE (stores-like warehouse)
+    return WarehouseType.SELLABLE
+
+
+def _build_tables(
+    classifications: Mapping[str, WarehouseType], hierarchy: Mapping[str, Sequence[str]]
+) -> Tuple[Dict[str, int], List[str], List[WarehouseType], List[Optional[List[int]]]]:
+    """
+    Build integer-id tables for expanding warehouse lists against fixed mappings.
+
+    Returns (normalized name -> id, then per-id display name, type and child ids,
+    None for leaves). Only names from the mappings get ids; other names are
+    classified on the fly by the caller.
+    """
+    intern: Dict[str, int] = {}
+    names: List[str] = []
+    types: List[WarehouseType] = []
+    children: List[Optional[List[int]]] = []
+
+    def register(name: str) -> int:
+        key = name.lower().strip()
+        wid = intern.get(key)
+        if wid is None:
+            wid = len(names)
+            intern[key] = wid
+            names.append(name)
+            wh_type = classifications.get(key)
+            types.append(wh_type if wh_type is not None else _classify_by_pattern(key))
+            children.append(None)
+        return wid
+
+    # Register children first so their hierarchy spelling becomes the display name
+    for group_children in hierarchy.values():
+        for child in group_children:
+            register(child)
+    for name in classifications:
+        register(name)
+    for group, group_children in hierarchy.items():
+        children[register(group)] = [register(child) for child in group_children]
+
+    return intern, names, types, children
+
 
 class WarehouseManager:
     """Manages warehouse classification and hierarchy for OTP calculations."""
@@ -110,11 +184,15 @@ class WarehouseManager:
 
         Default behavior:
         - If exact match found in classifications, return that
-        - If contains "transit" or "in transit", classify as IN_TRANSIT
+        - If contains "transit", classify as IN_TRANSIT
         - If contains "wip" or "work in progress", classify as NOT_AVAILABLE
-        - If contains "finished goods", classify as NEEDS_PROCESSING
+        - If contains "finished", classify as NEEDS_PROCESSING
         - If contains "all" or "group", classify as GROUP
+        - If contains "scrap" or "reject", classify as NOT_AVAILABLE
         - Otherwise, default to SELLABLE (conservative assumption)
+
+        Keywords match anywhere in the name (e.g. "scrap" in "Scrapyard"); when
+        several match, the earlier rule in this list wins.
         """
         if not warehouse_name:
             return WarehouseType.SELLABLE
@@ -125,20 +203,7 @@ class WarehouseManager:
         if normalized in self.classifications:
             return self.classifications[normalized]
 
-        # Pattern matching for unmapped warehouses
-        if "transit" in normalized or "in transit" in normalized:
-            return WarehouseType.IN_TRANSIT
-        elif "wip" in normalized or "work in progress" in normalized:
-            return WarehouseType.NOT_AVAILABLE
-        elif "finished goods" in normalized or "finished" in normalized:
-            return WarehouseType.NEEDS_PROCESSING
-        elif "all" in normalized or "group" in normalized:
-            return WarehouseType.GROUP
-        elif "scrap" in normalized or "reject" in normalized:
-            return WarehouseType.NOT_AVAILABLE
-
-        # Default to SELLABLE (stores-like warehouse)
-        return WarehouseType.SELLABLE
+        return _classify_by_pattern(normalized)
 
     def is_group_warehouse(self, warehouse_name: str) -> bool:
         """Check if warehouse is a group warehouse."""
@@ -155,7 +220,7 @@ class WarehouseManager:
             List of child warehouse names, or empty list if not a group
         """
         normalized = group_warehouse.lower().strip()
-        return self.hierarchy.get(normalized, [])
+        return list(self.hierarchy.get(normalized, ()))
 
     def expand_warehouse_list(
         self, warehouse_names: List[str], deduplicate: bool = True
@@ -176,30 +241,29 @@ class WarehouseManager:
                 "Work In Progress - SD"]
         """
         expanded: List[str] = []
+        # Normalized name -> first-seen spelling
+        unique: Dict[str, str] = {}
 
         for warehouse in warehouse_names:
             if self.is_group_warehouse(warehouse):
                 children = self.get_child_warehouses(warehouse)
-                if children:
-                    logger.debug(f"Expanding group warehouse '{warehouse}' to children: {children}")
-                    expanded.extend(children)
-                else:
+                if not children:
                     logger.warning(
                         f"Group warehouse '{warehouse}' has no children defined; skipping"
                     )
+                    continue
+                logger.debug(f"Expanding group warehouse '{warehouse}' to children: {children}")
             else:
-                expanded.append(warehouse)
+                children = [warehouse]
+
+            if deduplicate:
+                for wh in children:
+                    unique.setdefault(wh.lower().strip() if wh else "", wh)
+            else:
+                expanded.extend(children)
 
         if deduplicate:
-            # Preserve order while removing duplicates
-            seen: Set[str] = set()
-            result = []
-            for wh in expanded:
-                wh_normalized = wh.lower().strip()
-                if wh_normalized not in seen:
-                    seen.add(wh_normalized)
-                    result.append(wh)
-            return result
+            return list(unique.values())
 
         return expanded
 
@@ -259,5 +323,63 @@ class WarehouseManager:
         return f"{qty} units in {warehouse_name}"
 
 
+class _DefaultWarehouseManager(WarehouseManager):
+    """
+    Shared manager over the built-in defaults.
+
+    Its mappings are read-only (group children are tuples), so the id tables used
+    by expand_warehouse_list are built once at import and can't go stale.
+    """
+
+    def __init__(self):
+        """Initialize with read-only default mappings and prebuilt expansion tables."""
+        self.classifications = MappingProxyType(dict(DEFAULT_WAREHOUSE_CLASSIFICATIONS))
+        self.hierarchy = MappingProxyType(
+            {group: tuple(children) for group, children in DEFAULT_WAREHOUSE_HIERARCHY.items()}
+        )
+        self._tables = _build_tables(self.classifications, self.hierarchy)
+
+    def expand_warehouse_list(
+        self, warehouse_names: List[str], deduplicate: bool = True
+    ) -> List[str]:
+        """Expand warehouse list via the prebuilt tables (see WarehouseManager)."""
+        intern, names, types, children = self._tables
+        expanded: List[str] = []
+        # Warehouse id (normalized name if unmapped) -> first-seen name
+        unique: Dict[object, str] = {}
+
+        for warehouse in warehouse_names:
+            key = warehouse.lower().strip() if warehouse else ""
+            wid = intern.get(key)
+            if wid is None:
+                wh_type, child_ids, unique_key = _classify_by_pattern(key), None, key
+            else:
+                wh_type, child_ids, unique_key = types[wid], children[wid], wid
+
+            if wh_type is WarehouseType.GROUP:
+                if not child_ids:
+                    logger.warning(
+                        f"Group warehouse '{warehouse}' has no children defined; skipping"
+                    )
+                    continue
+                logger.debug(
+                    f"Expanding group warehouse '{warehouse}' to {len(child_ids)} children"
+                )
+                if deduplicate:
+                    for cid in child_ids:
+                        unique.setdefault(cid, names[cid])
+                else:
+                    expanded.extend(names[cid] for cid in child_ids)
+            elif deduplicate:
+                unique.setdefault(unique_key, warehouse)
+            else:
+                expanded.append(warehouse)
+
+        if deduplicate:
+            return list(unique.values())
+
+        return expanded
+
+
 # Global default instance
-default_warehouse_manager = WarehouseManager()
+default_warehouse_manager = _DefaultWarehouseManager()
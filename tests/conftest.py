@@ -1,53 +1,101 @@
 """Pytest configuration and fixtures for all tests."""
 import sys
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timezone
 
 import pytest
-from unittest.mock import MagicMock
-
-try:
-    from unittest.mock import AsyncMock
-except ImportError:
-    # AsyncMock not available in Python < 3.8, create a simple mock
-    from unittest.mock import MagicMock
-
-    AsyncMock = MagicMock
+from unittest.mock import AsyncMock, MagicMock, create_autospec
 
 # Add project root to Python path so 'src' module can be imported
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 
+@pytest.fixture(autouse=True)
+def clear_stock_cache():
+    """Reset the shared stock/supply TTL cache so lookups never leak between tests."""
+    from src.services.stock_service import clear_stock_cache as _clear
+
+    _clear()
+    yield
+    _clear()
+
+
+@pytest.fixture(scope="session")
+def app():
+    """Fixture providing the FastAPI application, imported once for the session's clients."""
+    from src.main import app as fastapi_app
+
+    return fastapi_app
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    """
+    Fixture providing one TestClient for the whole session.
+    Not entered as a context manager, so the app's startup/shutdown events never run;
+    the API tests mock ERPNext and need neither.
+    """
+    from fastapi.testclient import TestClient
+
+    return TestClient(app)
+
+
+@pytest.fixture(scope="session")
+def openapi_schema(app):
+    """
+    Fixture providing the app's OpenAPI document, generated once per session.
+    Route-registration tests read it directly instead of fetching /openapi.json.
+    """
+    return app.openapi()
+
+
+@pytest.fixture(scope="session")
+def openapi_paths(openapi_schema):
+    """Fixture providing the OpenAPI "paths" mapping, for route-registration checks."""
+    return openapi_schema["paths"]
+
+
+@pytest.fixture(scope="session")
+async def aclient(app):
+    """
+    Fixture providing one httpx.AsyncClient for the whole session, wired straight to the ASGI app.
+    Requests run in the session event loop, without TestClient's blocking-portal thread hop.
+    """
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as ac:
+        yield ac
+
+
 @pytest.fixture(scope="session")
 def today():
     """
     Fixture providing today's date matching the service's timezone logic.
     Uses UTC like the promise_service._get_today() method to avoid timezone mismatches.
     """
-    import pytz
+    return datetime.now(timezone.utc).date()
+
+
+@pytest.fixture(scope="session")
+def erpnext_client_autospec():
+    """
+    Fixture providing one autospecced ERPNext client for the session.
+    Autospeccing introspects every ERPNextClient method, so it is done once;
+    use mock_erpnext_client in tests, which resets this mock after each one.
+    """
+    from src.clients.erpnext_client import ERPNextClient
 
-    tz = pytz.timezone("UTC")
-    return datetime.now(tz).date()
+    # Autospecced so ERPNextClient's (synchronous) method signatures are enforced
+    return create_autospec(ERPNextClient, instance=True)
 
 
 @pytest.fixture(scope="function")
-def mock_erpnext_client():
-    """Fixture providing a mocked ERPNext client (function-scoped to avoid state pollution)."""
-    client = MagicMock()
-    # These methods are actually SYNCHRONOUS, not async
-    client.get_bin_details = MagicMock()
-    client.get_incoming_purchase_orders = MagicMock()
-    client.get_sales_order_list = MagicMock()
-    client.get_sales_order = MagicMock()
-    client.get_sales_order_items = MagicMock()
-    client.get_item_details = MagicMock()
-    client.create_document = MagicMock()
-    client.update_document = MagicMock()
-    client.delete_document = MagicMock()
-    client.execute_method = MagicMock()
-    client.get_stock_balance = MagicMock()
-    return client
+def mock_erpnext_client(erpnext_client_autospec):
+    """Fixture providing a mocked ERPNext client (calls and canned results reset per test)."""
+    yield erpnext_client_autospec
+    erpnext_client_autospec.reset_mock(return_value=True, side_effect=True)
 
 
 @pytest.fixture(scope="module")
@@ -61,9 +109,9 @@ def mock_warehouse_manager():
     return manager
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def sample_promise_request():
-    """Fixture providing a sample promise request (module-scoped)."""
+    """Fixture providing a sample promise request (session-scoped; treat as read-only)."""
     from src.models.request_models import PromiseRequest, ItemRequest, PromiseRules, DesiredDateMode
 
     return PromiseRequest(
@@ -84,9 +132,9 @@ def sample_promise_request():
     )
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def sample_promise_response():
-    """Fixture providing a sample promise response (module-scoped)."""
+    """Fixture providing a sample promise response (session-scoped; treat as read-only)."""
     from src.models.response_models import (
         PromiseResponse,
         ItemPlan,
@@ -97,7 +145,7 @@ def sample_promise_response():
     return PromiseResponse(
         status=PromiseStatus.OK,
         promise_date=datetime(2024, 2, 15).date(),
-        confidence=95,
+        confidence="HIGH",
         can_fulfill=True,
         plan=[
             ItemPlan(
@@ -123,9 +171,9 @@ def sample_promise_response():
     )
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def mock_stock_data():
-    """Fixture providing mock stock data (module-scoped)."""
+    """Fixture providing mock stock data (session-scoped; treat as read-only)."""
     return {
         "ITEM-001": {
             "warehouse": "WH-Main",
@@ -144,9 +192,9 @@ def mock_stock_data():
     }
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def mock_purchase_orders():
-    """Fixture providing mock purchase order data (module-scoped)."""
+    """Fixture providing mock purchase order data (session-scoped; treat as read-only)."""
     return [
         {
             "name": "PO-001",
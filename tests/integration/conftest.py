@@ -0,0 +1,45 @@
+"""Fixtures for integration tests against a real ERPNext."""
+import pytest
+from src.config import settings
+
+# Don't even import the integration modules unless they will run
+collect_ignore_glob = [] if settings.run_integration else ["test_*.py"]
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    """
+    Fixture providing one TestClient for the integration session.
+    Entered as a context manager, unlike the root client: startup runs once, and shutdown
+    closes the pooled ERPNext connections that every test has reused.
+    """
+    from fastapi.testclient import TestClient
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def clear_stock_cache():
+    """
+    Override the root autouse fixture: keep the stock/supply TTL cache across tests.
+    Integration tests only read ERPNext stock, so repeated lookups of the same item
+    are served from the cache (within its TTL) as they would be in production.
+    """
+    yield
+
+
+@pytest.fixture(scope="session")
+def record_mode(request):
+    """
+    Default the @pytest.mark.vcr record mode to "once" (pytest-recording's is "none").
+    The first run records ERPNext's responses into tests/integration/cassettes/; later
+    runs replay them. Pass --record-mode=rewrite to re-record against a changed ERPNext.
+    """
+    return request.config.getoption("--record-mode") or "once"
+
+
+@pytest.fixture(scope="module")
+def vcr_config():
+    """Cassette settings: never write the ERPNext API token to disk."""
+    return {"filter_headers": ["authorization"]}
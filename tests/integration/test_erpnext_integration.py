@@ -1,8 +1,8 @@
 """Integration tests for OTP API with real ERPNext."""
+import asyncio
+import json
 import pytest
 from datetime import date, timedelta
-from fastapi.testclient import TestClient
-from src.main import app
 from src.config import settings
 
 # Skip all tests in this file if run_integration is False
@@ -14,18 +14,47 @@ pytestmark = [
     ),
 ]
 
-client = TestClient(app)
-
-
+# Promise request bodies that don't depend on today's date, pre-encoded once
+_MULTI_ITEM_BODY = json.dumps(
+    {
+        "customer": "Test Customer",
+        "items": [
+            {"item_code": "ITEM-A", "qty": 5.0},
+            {"item_code": "ITEM-B", "qty": 10.0},
+            {"item_code": "ITEM-C", "qty": 15.0},
+        ],
+        "rules": {"no_weekends": True, "lead_time_buffer_days": 1},
+    }
+).encode()
+_WAREHOUSE_BODY = json.dumps(
+    {
+        "customer": "Test Customer",
+        "items": [{"item_code": "TEST-ITEM", "qty": 5.0, "warehouse": "Finished Goods - WH"}],
+    }
+).encode()
+_NO_LEAD_TIME_BODY = json.dumps(
+    {
+        "customer": "Test Customer",
+        "items": [{"item_code": "ITEM-Z", "qty": 1.0}],
+        "rules": {"no_weekends": True, "lead_time_buffer_days": 0, "processing_lead_time_days": 0},
+    }
+).encode()
+_CONCURRENT_BODY = json.dumps(
+    {"customer": "Concurrent Test", "items": [{"item_code": "CONCURRENT-ITEM", "qty": 1.0}]}
+).encode()
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+@pytest.mark.vcr
 class TestPromiseEndpointIntegration:
     """Integration tests for /otp/promise endpoint with real ERPNext."""
 
-    def test_promise_calculation_with_real_erpnext(self):
+    def test_promise_calculation_with_real_erpnext(self, client, today):
         """Test promise calculation using real ERPNext data."""
         request_data = {
             "customer": "Test Customer",
             "items": [{"item_code": "TEST-ITEM-001", "qty": 10.0, "warehouse": "Stores - WH"}],
-            "desired_date": (date.today() + timedelta(days=10)).isoformat(),
+            "desired_date": (today + timedelta(days=10)).isoformat(),
             "rules": {
                 "no_weekends": True,
                 "cutoff_time": "14:00",
@@ -49,19 +78,9 @@ class TestPromiseEndpointIntegration:
         assert "plan" in data
         assert isinstance(data["plan"], list)
 
-    def test_promise_calculation_multiple_items(self):
+    def test_promise_calculation_multiple_items(self, client):
         """Test promise calculation with multiple items."""
-        request_data = {
-            "customer": "Test Customer",
-            "items": [
-                {"item_code": "ITEM-A", "qty": 5.0},
-                {"item_code": "ITEM-B", "qty": 10.0},
-                {"item_code": "ITEM-C", "qty": 15.0},
-            ],
-            "rules": {"no_weekends": True, "lead_time_buffer_days": 1},
-        }
-
-        response = client.post("/otp/promise", json=request_data)
+        response = client.post("/otp/promise", content=_MULTI_ITEM_BODY, headers=_JSON_HEADERS)
 
         assert response.status_code == 200
         data = response.json()
@@ -76,22 +95,17 @@ class TestPromiseEndpointIntegration:
             assert "fulfillment" in item_plan
             assert "shortage" in item_plan
 
-    def test_promise_calculation_with_warehouse_specified(self):
+    def test_promise_calculation_with_warehouse_specified(self, client):
         """Test promise calculation with specific warehouse."""
-        request_data = {
-            "customer": "Test Customer",
-            "items": [{"item_code": "TEST-ITEM", "qty": 5.0, "warehouse": "Finished Goods - WH"}],
-        }
-
-        response = client.post("/otp/promise", json=request_data)
+        response = client.post("/otp/promise", content=_WAREHOUSE_BODY, headers=_JSON_HEADERS)
         assert response.status_code == 200
 
-    def test_promise_calculation_strict_fail_mode(self):
+    def test_promise_calculation_strict_fail_mode(self, client, today):
         """Test STRICT_FAIL mode with desired date."""
         request_data = {
             "customer": "Test Customer",
             "items": [{"item_code": "ITEM-X", "qty": 100.0}],
-            "desired_date": (date.today() + timedelta(days=2)).isoformat(),
+            "desired_date": (today + timedelta(days=2)).isoformat(),
             "rules": {"desired_date_mode": "STRICT_FAIL", "no_weekends": False},
         }
 
@@ -105,9 +119,9 @@ class TestPromiseEndpointIntegration:
         assert "desired_date_mode" in data
         assert "on_time" in data
 
-    def test_promise_calculation_no_early_delivery_mode(self):
+    def test_promise_calculation_no_early_delivery_mode(self, client, today):
         """Test NO_EARLY_DELIVERY mode."""
-        future_date = date.today() + timedelta(days=20)
+        future_date = today + timedelta(days=20)
 
         request_data = {
             "customer": "Test Customer",
@@ -122,19 +136,9 @@ class TestPromiseEndpointIntegration:
         data = response.json()
         assert data["desired_date_mode"] == "NO_EARLY_DELIVERY"
 
-    def test_promise_calculation_with_weekend_handling(self):
+    def test_promise_calculation_with_weekend_handling(self, client):
         """Test promise calculation respects weekend rules."""
-        request_data = {
-            "customer": "Test Customer",
-            "items": [{"item_code": "ITEM-Z", "qty": 1.0}],
-            "rules": {
-                "no_weekends": True,
-                "lead_time_buffer_days": 0,
-                "processing_lead_time_days": 0,
-            },
-        }
-
-        response = client.post("/otp/promise", json=request_data)
+        response = client.post("/otp/promise", content=_NO_LEAD_TIME_BODY, headers=_JSON_HEADERS)
 
         assert response.status_code == 200
         data = response.json()
@@ -148,49 +152,33 @@ class TestPromiseEndpointIntegration:
 class TestPromiseEndpointValidation:
     """Test request validation for promise endpoint."""
 
-    def test_promise_validation_missing_customer(self):
-        """Test validation error when customer is missing."""
-        request_data = {"items": [{"item_code": "ITEM-A", "qty": 5.0}]}
-
-        response = client.post("/otp/promise", json=request_data)
-        assert response.status_code == 422  # Validation error
-
-    def test_promise_validation_missing_items(self):
-        """Test validation error when items are missing."""
-        request_data = {"customer": "Test Customer"}
-
-        response = client.post("/otp/promise", json=request_data)
-        assert response.status_code == 422
-
-    def test_promise_validation_empty_items(self):
-        """Test validation error when items list is empty."""
-        request_data = {"customer": "Test Customer", "items": []}
-
-        response = client.post("/otp/promise", json=request_data)
-        assert response.status_code == 422
-
-    def test_promise_validation_negative_quantity(self):
-        """Test validation error for negative quantity."""
-        request_data = {
-            "customer": "Test Customer",
-            "items": [{"item_code": "ITEM-A", "qty": -5.0}],
-        }
-
-        response = client.post("/otp/promise", json=request_data)
-        assert response.status_code == 422
-
-    def test_promise_validation_zero_quantity(self):
-        """Test validation error for zero quantity."""
-        request_data = {"customer": "Test Customer", "items": [{"item_code": "ITEM-A", "qty": 0.0}]}
-
+    @pytest.mark.parametrize(
+        "request_data",
+        [
+            pytest.param({"items": [{"item_code": "ITEM-A", "qty": 5.0}]}, id="missing-customer"),
+            pytest.param({"customer": "Test Customer"}, id="missing-items"),
+            pytest.param({"customer": "Test Customer", "items": []}, id="empty-items"),
+            pytest.param(
+                {"customer": "Test Customer", "items": [{"item_code": "ITEM-A", "qty": -5.0}]},
+                id="negative-quantity",
+            ),
+            pytest.param(
+                {"customer": "Test Customer", "items": [{"item_code": "ITEM-A", "qty": 0.0}]},
+                id="zero-quantity",
+            ),
+        ],
+    )
+    def test_promise_validation_error(self, client, request_data):
+        """Test that invalid promise requests are rejected with 422 before reaching ERPNext."""
         response = client.post("/otp/promise", json=request_data)
         assert response.status_code == 422
 
 
+@pytest.mark.vcr
 class TestHealthEndpointIntegration:
     """Integration tests for health check endpoint."""
 
-    def test_health_check_with_erpnext(self):
+    def test_health_check_with_erpnext(self, client):
         """Test health check reports ERPNext connectivity."""
         response = client.get("/otp/health")
 
@@ -208,22 +196,7 @@ class TestHealthEndpointIntegration:
 class TestApplyPromiseIntegration:
     """Integration tests for /otp/apply endpoint with real ERPNext."""
 
-    def test_apply_promise_to_sales_order(self):
-        """Test applying promise date to actual Sales Order."""
-        # This test requires a valid Sales Order to exist
-        request_data = {
-            "sales_order_id": "SO-TEST-001",
-            "promise_date": (date.today() + timedelta(days=7)).isoformat(),
-            "confidence": "HIGH",
-            "action": "both",
-        }
-
-        response = client.post("/otp/apply", json=request_data)
-
-        # Will fail if SO doesn't exist, but should handle gracefully
-        assert response.status_code in [200, 404, 500]
-
-    def test_apply_promise_validation(self):
+    def test_apply_promise_validation(self, client):
         """Test apply promise request validation."""
         # Missing required fields
         request_data = {
@@ -235,10 +208,11 @@ class TestApplyPromiseIntegration:
         assert response.status_code == 422
 
 
+@pytest.mark.vcr
 class TestSalesOrdersEndpointIntegration:
     """Integration tests for sales orders listing endpoint."""
 
-    def test_get_sales_orders_list(self):
+    def test_get_sales_orders_list(self, client):
         """Test retrieving sales orders from ERPNext."""
         response = client.get("/otp/sales-orders")
 
@@ -249,14 +223,14 @@ class TestSalesOrdersEndpointIntegration:
         # Response is a list of sales orders
         assert isinstance(data, list)
 
-    def test_get_sales_orders_with_filters(self):
+    def test_get_sales_orders_with_filters(self, client):
         """Test retrieving sales orders with filters."""
         params = {"status": "Draft", "limit": 10}
 
         response = client.get("/otp/sales-orders", params=params)
         assert response.status_code == 200
 
-    def test_get_sales_order_details(self):
+    def test_get_sales_order_details(self, client):
         """Test retrieving specific sales order details."""
         # Will return 404 if SO doesn't exist
         response = client.get("/otp/sales-orders/SO-TEST-001")
@@ -268,46 +242,19 @@ class TestSalesOrdersEndpointIntegration:
             assert "name" in data or "sales_order" in data
 
 
-class TestErrorHandling:
-    """Test error handling with real ERPNext."""
-
-    def test_invalid_endpoint_returns_404(self):
-        """Test that invalid endpoint returns 404."""
-        response = client.get("/otp/nonexistent")
-        assert response.status_code == 404
-
-    def test_invalid_method_returns_405(self):
-        """Test that invalid HTTP method returns 405."""
-        response = client.put("/otp/promise")
-        assert response.status_code == 405
-
-    def test_malformed_json_returns_422(self):
-        """Test that malformed JSON returns validation error."""
-        response = client.post(
-            "/otp/promise", data="not json", headers={"Content-Type": "application/json"}
-        )
-        assert response.status_code == 422
-
-
 class TestConcurrentRequests:
     """Test handling of concurrent requests."""
 
-    def test_multiple_concurrent_promise_calculations(self):
+    async def test_multiple_concurrent_promise_calculations(self, aclient):
         """Test that multiple requests can be handled concurrently."""
-        import concurrent.futures
-
-        def make_request():
-            request_data = {
-                "customer": "Concurrent Test",
-                "items": [{"item_code": "CONCURRENT-ITEM", "qty": 1.0}],
-            }
-            with TestClient(app) as local_client:
-                return local_client.post("/otp/promise", json=request_data)
-
-        # Make 5 concurrent requests
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            futures = [executor.submit(make_request) for _ in range(5)]
-            responses = [f.result() for f in concurrent.futures.as_completed(futures)]
-
-        # All should succeed
-        assert all(r.status_code == 200 for r in responses)
+
+        async def post_promise():
+            response = await aclient.post(
+                "/otp/promise", content=_CONCURRENT_BODY, headers=_JSON_HEADERS
+            )
+            assert response.status_code == 200
+
+        # Make 5 concurrent requests; the first failure cancels the rest
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(5):
+                tg.create_task(post_promise())
@@ -8,6 +8,15 @@ from src.clients.erpnext_client import ERPNextClientError
 pytestmark = pytest.mark.unit
 
 
+@pytest.fixture
+def mock_client_with_so():
+    """ERPNext client mock where Sales Order SO-001 exists and comments can be added."""
+    mock_client = MagicMock()
+    mock_client.get_sales_order.return_value = {"name": "SO-001"}
+    mock_client.add_comment_to_doc.return_value = {"name": "COMMENT-001"}
+    return mock_client
+
+
 class TestApplyServiceSuccessPath:
     """Test successful promise application."""
 
@@ -262,22 +271,20 @@ class TestApplyServiceCreateMaterialRequest:
 class TestApplyServiceEdgeCases:
     """Test edge cases and boundary conditions."""
 
-    def test_apply_promise_with_all_confidence_levels(self):
+    @pytest.mark.parametrize("confidence", ["HIGH", "MEDIUM", "LOW"])
+    def test_apply_promise_with_all_confidence_levels(self, mock_client_with_so, confidence):
         """Test applying promise with different confidence levels."""
-        for confidence in ["HIGH", "MEDIUM", "LOW"]:
-            mock_client = MagicMock()
-            mock_client.get_sales_order.return_value = {"name": "SO-001"}
-            mock_client.add_comment_to_doc.return_value = {"name": "COMMENT-001"}
-
-            service = ApplyService(mock_client)
-            result = service.apply_promise_to_sales_order(
-                sales_order_id="SO-001",
-                promise_date=date(2026, 2, 10),
-                confidence=confidence,
-                action="add_comment",
-            )
-
-            assert result.status == "success"
+        service = ApplyService(mock_client_with_so)
+        result = service.apply_promise_to_sales_order(
+            sales_order_id="SO-001",
+            promise_date=date(2026, 2, 10),
+            confidence=confidence,
+            action="add_comment",
+        )
+
+        assert result.status == "success"
+        comment_text = mock_client_with_so.add_comment_to_doc.call_args.args[2]
+        assert f"(Confidence: {confidence})" in comment_text
 
     def test_empty_items_list_material_request(self):
         """Test material request creation with empty items list."""
@@ -2,7 +2,12 @@
 import pytest
 import httpx
 from unittest.mock import MagicMock, patch
-from src.clients.erpnext_client import ERPNextClient, ERPNextClientError
+from src.clients.erpnext_client import (
+    ERPNextClient,
+    ERPNextClientError,
+    close_global_client,
+    get_global_client,
+)
 
 pytestmark = pytest.mark.unit
 
@@ -23,11 +28,9 @@ class TestERPNextClientHTTPErrors:
         # Test unwrapping 'data' field
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {"data": {"name": "SO-00001", "customer": "Test Customer"}}
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200, json={"data": {"name": "SO-00001", "customer": "Test Customer"}}
+            )
             result = client.get_sales_order("SO-00001")
             assert result["name"] == "SO-00001"
             assert result["customer"] == "Test Customer"
@@ -35,11 +38,9 @@ class TestERPNextClientHTTPErrors:
         # Test raw data without wrapper
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {"name": "SO-00001", "customer": "Test Customer"}
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200, json={"name": "SO-00001", "customer": "Test Customer"}
+            )
             result = client.get_sales_order("SO-00001")
             assert result["name"] == "SO-00001"
             assert result["customer"] == "Test Customer"
@@ -47,16 +48,15 @@ class TestERPNextClientHTTPErrors:
         # Test unwrapping 'message' field
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {
-                "message": [
-                    {"name": "SO-001", "customer": "Cust-A"},
-                    {"name": "SO-002", "customer": "Cust-B"},
-                ]
-            }
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200,
+                json={
+                    "message": [
+                        {"name": "SO-001", "customer": "Cust-A"},
+                        {"name": "SO-002", "customer": "Cust-B"},
+                    ]
+                },
+            )
             result = client.get_sales_order_list()
             assert isinstance(result, list)
             assert len(result) == 2
@@ -97,29 +97,40 @@ class TestERPNextClientHTTPErrors:
         # Test ERPNext error with 'exception' field
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {
-                "exception": "Invalid Item Code",
-                "exc_type": "ValidationError",
-            }
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200,
+                json={
+                    "exception": "Invalid Item Code",
+                    "exc_type": "ValidationError",
+                },
+            )
             with pytest.raises(ERPNextClientError) as exc_info:
                 client.get_stock_balance("INVALID_ITEM")
-            assert "Invalid Item Code" in str(exc_info.value) or "error" in str(exc_info.value).lower()
+            assert (
+                "Invalid Item Code" in str(exc_info.value) or "error" in str(exc_info.value).lower()
+            )
 
         # Test ERPNext error with 'exc_type' field
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {"exc_type": "frappe.exceptions.PermissionError"}
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200, json={"exc_type": "frappe.exceptions.PermissionError"}
+            )
             with pytest.raises(ERPNextClientError):
                 client.get_sales_order_list()
 
+    @pytest.mark.parametrize("status", [403, 404, 500])
+    def test_http_error_carries_status_code(self, status):
+        """Test that HTTP errors keep ERPNext's status code on the raised error."""
+        client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
+        with patch.object(client, "client", new_callable=MagicMock) as mock_client:
+            mock_client.request.return_value = httpx.Response(
+                status, request=httpx.Request("GET", "http://test.local/api/resource/Bin")
+            )
+            with pytest.raises(ERPNextClientError) as exc_info:
+                client.get_value("Bin", filters={"item_code": "ITEM-001"})
+        assert exc_info.value.status_code == status
+
 
 class TestERPNextClientStockBalance:
     """Test get_stock_balance method."""
@@ -129,17 +140,16 @@ class TestERPNextClientStockBalance:
         # Test with warehouse parameter
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {
-                "data": {
-                    "actual_qty": 50.0,
-                    "reserved_qty": 5.0,
-                    "available_qty": 45.0,
-                }
-            }
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200,
+                json={
+                    "data": {
+                        "actual_qty": 50.0,
+                        "reserved_qty": 5.0,
+                        "available_qty": 45.0,
+                    }
+                },
+            )
             result = client.get_stock_balance("ITEM-001", warehouse="WH-Main")
             assert result["actual_qty"] == 50.0
             call_args = mock_client.request.call_args
@@ -147,17 +157,16 @@ class TestERPNextClientStockBalance:
 
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {
-                "data": {
-                    "actual_qty": 100.0,
-                    "reserved_qty": 0.0,
-                    "available_qty": 100.0,
-                }
-            }
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200,
+                json={
+                    "data": {
+                        "actual_qty": 100.0,
+                        "reserved_qty": 0.0,
+                        "available_qty": 100.0,
+                    }
+                },
+            )
             result = client.get_stock_balance("ITEM-002")
             assert result["actual_qty"] == 100.0
 
@@ -170,11 +179,9 @@ class TestERPNextClientSuccessfulResponses:
         # Test unwrapping 'data' field
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {"data": {"name": "SO-00001", "customer": "Test Customer"}}
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200, json={"data": {"name": "SO-00001", "customer": "Test Customer"}}
+            )
             result = client.get_sales_order("SO-00001")
             assert result["name"] == "SO-00001"
             assert result["customer"] == "Test Customer"
@@ -182,11 +189,9 @@ class TestERPNextClientSuccessfulResponses:
         # Test raw data without wrapper
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {"name": "SO-00001", "customer": "Test Customer"}
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200, json={"name": "SO-00001", "customer": "Test Customer"}
+            )
             result = client.get_sales_order("SO-00001")
             assert result["name"] == "SO-00001"
             assert result["customer"] == "Test Customer"
@@ -194,16 +199,15 @@ class TestERPNextClientSuccessfulResponses:
         # Test unwrapping 'message' field
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {
-                "message": [
-                    {"name": "SO-001", "customer": "Cust-A"},
-                    {"name": "SO-002", "customer": "Cust-B"},
-                ]
-            }
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200,
+                json={
+                    "message": [
+                        {"name": "SO-001", "customer": "Cust-A"},
+                        {"name": "SO-002", "customer": "Cust-B"},
+                    ]
+                },
+            )
             result = client.get_sales_order_list()
             assert isinstance(result, list)
             assert len(result) == 2
@@ -217,11 +221,9 @@ class TestERPNextClientBinDetails:
         # Test unwrapping 'data' field
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {"data": {"name": "SO-00001", "customer": "Test Customer"}}
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200, json={"data": {"name": "SO-00001", "customer": "Test Customer"}}
+            )
             result = client.get_sales_order("SO-00001")
             assert result["name"] == "SO-00001"
             assert result["customer"] == "Test Customer"
@@ -229,11 +231,9 @@ class TestERPNextClientBinDetails:
         # Test raw data without wrapper
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {"name": "SO-00001", "customer": "Test Customer"}
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200, json={"name": "SO-00001", "customer": "Test Customer"}
+            )
             result = client.get_sales_order("SO-00001")
             assert result["name"] == "SO-00001"
             assert result["customer"] == "Test Customer"
@@ -241,16 +241,15 @@ class TestERPNextClientBinDetails:
         # Test unwrapping 'message' field
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {
-                "message": [
-                    {"name": "SO-001", "customer": "Cust-A", "reserved_qty": 5.0},
-                    {"name": "SO-002", "customer": "Cust-B", "reserved_qty": 2.0},
-                ]
-            }
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200,
+                json={
+                    "message": [
+                        {"name": "SO-001", "customer": "Cust-A", "reserved_qty": 5.0},
+                        {"name": "SO-002", "customer": "Cust-B", "reserved_qty": 2.0},
+                    ]
+                },
+            )
             result = client.get_sales_order_list()
             assert isinstance(result, list)
             assert len(result) == 2
@@ -265,20 +264,19 @@ class TestERPNextClientPurchaseOrders:
         # Test PO transformation
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = [
-                {
-                    "parent": "PO-001",
-                    "item_code": "ITEM-001",
-                    "qty": 100,
-                    "received_qty": 20,
-                    "schedule_date": "2026-02-10",
-                    "warehouse": "WH-Main",
-                }
-            ]
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200,
+                json=[
+                    {
+                        "parent": "PO-001",
+                        "item_code": "ITEM-001",
+                        "qty": 100,
+                        "received_qty": 20,
+                        "schedule_date": "2026-02-10",
+                        "warehouse": "WH-Main",
+                    }
+                ],
+            )
             result = client.get_incoming_purchase_orders("ITEM-001")
             assert len(result) == 1
             assert result[0]["po_id"] == "PO-001"
@@ -289,45 +287,37 @@ class TestERPNextClientPurchaseOrders:
         # Test empty list
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = []
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(200, json=[])
             result = client.get_incoming_purchase_orders("ITEM-NEVER-ORDERED")
             assert result == []
 
         # Test non-list response handled gracefully
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {"data": []}
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(200, json={"data": []})
             result = client.get_incoming_purchase_orders("ITEM-001")
             assert result == []
 
         # Test get_value method with filters
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {"data": [{"name": "ITEM-001", "description": "Test Item"}]}
-            mock_client.request.return_value = response
-            result = client.get_value("Item", filters={"item_code": "ITEM-001"}, fieldname=["name", "description"])
+            mock_client.request.return_value = httpx.Response(
+                200, json={"data": [{"name": "ITEM-001", "description": "Test Item"}]}
+            )
+            result = client.get_value(
+                "Item", filters={"item_code": "ITEM-001"}, fieldname=["name", "description"]
+            )
             assert result["name"] == "ITEM-001"
 
         # Test get_value method with filters
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {"data": [{"name": "ITEM-001", "description": "Test Item"}]}
-            mock_client.request.return_value = response
-            result = client.get_value("Item", filters={"item_code": "ITEM-001"}, fieldname=["name", "description"])
+            mock_client.request.return_value = httpx.Response(
+                200, json={"data": [{"name": "ITEM-001", "description": "Test Item"}]}
+            )
+            result = client.get_value(
+                "Item", filters={"item_code": "ITEM-001"}, fieldname=["name", "description"]
+            )
             assert result["name"] == "ITEM-001"
 
 
@@ -339,16 +329,15 @@ class TestERPNextClientSalesOrderList:
         # Test with data wrapper
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {
-                "data": [
-                    {"name": "SO-001", "customer": "Cust-A", "status": "Draft"},
-                    {"name": "SO-002", "customer": "Cust-B", "status": "To Deliver"},
-                ]
-            }
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200,
+                json={
+                    "data": [
+                        {"name": "SO-001", "customer": "Cust-A", "status": "Draft"},
+                        {"name": "SO-002", "customer": "Cust-B", "status": "To Deliver"},
+                    ]
+                },
+            )
             result = client.get_sales_order_list(limit=20)
             assert len(result) == 2
             assert result[0]["name"] == "SO-001"
@@ -356,11 +345,9 @@ class TestERPNextClientSalesOrderList:
         # Test direct list response
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = [{"name": "SO-003", "customer": "Cust-C"}]
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200, json=[{"name": "SO-003", "customer": "Cust-C"}]
+            )
             result = client.get_sales_order_list()
             assert len(result) == 1
             assert result[0]["name"] == "SO-003"
@@ -368,11 +355,7 @@ class TestERPNextClientSalesOrderList:
         # Test non-list response returns empty list
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {"some_field": "value"}
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(200, json={"some_field": "value"})
             result = client.get_sales_order_list()
             assert result == []
 
@@ -391,11 +374,7 @@ class TestERPNextClientHealthCheck:
         try:
             client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
             with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-                response = MagicMock()
-                response.status_code = 200
-                response.raise_for_status.return_value = None
-                response.json.return_value = {"message": "admin"}
-                mock_client.request.return_value = response
+                mock_client.request.return_value = httpx.Response(200, json={"message": "admin"})
                 result = client.health_check()
                 assert result is True
         finally:
@@ -430,6 +409,17 @@ class TestERPNextClientContextManager:
             client.close()
             mock_client.close.assert_not_called()
 
+    def test_instances_share_pooled_client(self):
+        """Test that clients reuse one pooled httpx.Client, recreated after close."""
+        first = ERPNextClient(base_url="http://a.local", api_key="test", api_secret="test")
+        second = ERPNextClient(base_url="http://b.local", api_key="test", api_secret="test")
+        assert first.client is second.client is get_global_client()
+
+        close_global_client()
+        assert first.client.is_closed
+        third = ERPNextClient(base_url="http://a.local", api_key="test", api_secret="test")
+        assert not third.client.is_closed
+
 
 class TestERPNextClientMaterialRequest:
     """Test create_material_request method."""
@@ -439,13 +429,9 @@ class TestERPNextClientMaterialRequest:
         # Test successful creation
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {
-                "data": {"name": "MR-001", "material_request_type": "Purchase"}
-            }
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200, json={"data": {"name": "MR-001", "material_request_type": "Purchase"}}
+            )
             items = [
                 {
                     "item_code": "ITEM-001",
@@ -461,11 +447,7 @@ class TestERPNextClientMaterialRequest:
         # Test non-dict response
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = "String response"
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(200, json="String response")
             items = [
                 {
                     "item_code": "ITEM-002",
@@ -479,11 +461,7 @@ class TestERPNextClientMaterialRequest:
         # Test empty items list
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {"name": "MR-EMPTY"}
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(200, json={"name": "MR-EMPTY"})
             result = client.create_material_request([], priority="Low")
             assert result["name"] == "MR-EMPTY"
             call_args = mock_client.request.call_args
@@ -497,11 +475,9 @@ class TestERPNextClientComments:
         """Test adding a comment to a document."""
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {"data": {"name": "COMMENT-001"}}
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200, json={"data": {"name": "COMMENT-001"}}
+            )
             result = client.add_comment_to_doc("Sales Order", "SO-001", "Test comment")
             assert result["name"] == "COMMENT-001"
             mock_client.request.assert_called_once()
@@ -514,12 +490,12 @@ class TestERPNextClientUpdateCustomField:
         """Test updating a custom field on Sales Order."""
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {"data": {"name": "SO-001", "custom_field": "value"}}
-            mock_client.request.return_value = response
-            result = client.update_sales_order_custom_field("SO-001", "custom_promise_date", "2026-02-15")
+            mock_client.request.return_value = httpx.Response(
+                200, json={"data": {"name": "SO-001", "custom_field": "value"}}
+            )
+            result = client.update_sales_order_custom_field(
+                "SO-001", "custom_promise_date", "2026-02-15"
+            )
             assert result["custom_field"] == "value"
             mock_client.request.assert_called_once()
 
@@ -527,12 +503,15 @@ class TestERPNextClientUpdateCustomField:
 class TestERPNextClientTimeoutException:
     """Test timeout exception handling."""
 
-    def test_timeout_exception_handling(self):
+    def test_timeout_exception_handling(self, monkeypatch):
         """Test that httpx.ReadTimeout is properly retried and raises RetryError."""
+        # Retry without tenacity's real backoff sleeps (1s, then 2s)
+        monkeypatch.setattr(ERPNextClient._make_request.retry, "sleep", lambda seconds: None)
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
             mock_client.request.side_effect = httpx.ReadTimeout("Request timed out")
             from tenacity import RetryError
+
             with pytest.raises(RetryError) as exc_info:
                 client.get_stock_balance("ITEM-001")
             assert mock_client.request.call_count == 3
@@ -554,20 +533,21 @@ class TestERPNextClientSalesOrderListParameters:
             ("CUST-001", "Draft", "2024-01-01", "2024-02-01", "SO-", 100, 50),  # All parameters
         ],
     )
-    def test_get_sales_order_list_with_parameters(self, customer, status, from_date, to_date, search, limit, offset):
+    def test_get_sales_order_list_with_parameters(
+        self, customer, status, from_date, to_date, search, limit, offset
+    ):
         """Test get_sales_order_list with various parameter combinations."""
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {
-                "data": [
-                    {"name": "SO-001", "customer": "CUST-001", "status": "Draft"},
-                    {"name": "SO-002", "customer": "CUST-002", "status": "Draft"},
-                ]
-            }
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(
+                200,
+                json={
+                    "data": [
+                        {"name": "SO-001", "customer": "CUST-001", "status": "Draft"},
+                        {"name": "SO-002", "customer": "CUST-002", "status": "Draft"},
+                    ]
+                },
+            )
             result = client.get_sales_order_list(
                 customer=customer,
                 status=status,
@@ -592,23 +572,24 @@ class TestERPNextClientResponseEdgeCases:
         # Test data field with invalid type
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {"data": "invalid_string"}
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(200, json={"data": "invalid_string"})
             result = client.get_sales_order_list()
             assert result == []
 
         # Test bin details with non-list data
         client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
         with patch.object(client, "client", new_callable=MagicMock) as mock_client:
-            response = MagicMock()
-            response.status_code = 200
-            response.raise_for_status.return_value = None
-            response.json.return_value = {"data": "not_a_list"}
-            mock_client.request.return_value = response
+            mock_client.request.return_value = httpx.Response(200, json={"data": "not_a_list"})
             result = client.get_bin_details("ITEM-001", "WH-1")
             assert result["item_code"] == "ITEM-001"
             assert result["warehouse"] == "WH-1"
             assert result["actual_qty"] == 0.0
+
+    def test_real_response_body_decoding(self):
+        """Test JSON decoding of real httpx responses, including malformed bodies."""
+        client = ERPNextClient(base_url="http://test.local", api_key="test", api_secret="test")
+        response = httpx.Response(200, json={"data": [{"name": "PO-001", "qty": 5.0}]})
+        assert client._handle_response(response) == [{"name": "PO-001", "qty": 5.0}]
+
+        with pytest.raises(ERPNextClientError, match="Unexpected error"):
+            client._handle_response(httpx.Response(200, content=b"<html>not json</html>"))
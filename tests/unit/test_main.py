@@ -1,13 +1,21 @@
 """Unit tests for main.py FastAPI application setup and exception handling."""
 import pytest
-from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, create_autospec
+from src import main
 from src.main import app
+from src.clients.erpnext_client import ERPNextClient
 
 pytestmark = pytest.mark.unit
 
 
-client = TestClient(app)
+@pytest.fixture
+def erpnext_client_class(monkeypatch):
+    """Autospecced ERPNextClient class for /health: ERPNext reachable, circuit breaker closed."""
+    client_class = create_autospec(ERPNextClient)
+    client_class.return_value.health_check.return_value = True
+    client_class.get_circuit_breaker_status.return_value = {"state": "closed"}
+    monkeypatch.setattr(main, "ERPNextClient", client_class)
+    return client_class
 
 
 class TestAppSetup:
@@ -18,17 +26,17 @@ class TestAppSetup:
         assert app.title == "ERPNext Order Promise Engine (OTP)"
         assert app.version == "0.1.0"
 
-    def test_docs_endpoint_available(self):
+    def test_docs_endpoint_available(self, client):
         """Test that docs endpoint is available."""
         response = client.get("/docs")
         assert response.status_code == 200
 
-    def test_redoc_endpoint_available(self):
+    def test_redoc_endpoint_available(self, client):
         """Test that redoc endpoint is available."""
         response = client.get("/redoc")
         assert response.status_code == 200
 
-    def test_openapi_schema_available(self):
+    def test_openapi_schema_available(self, client):
         """Test that OpenAPI schema is available."""
         response = client.get("/openapi.json")
         assert response.status_code == 200
@@ -40,79 +48,66 @@ class TestAppSetup:
 class TestHealthCheckEndpoint:
     """Test health check endpoint."""
 
-    def test_health_check_success_when_erpnext_connected(self):
+    def test_health_check_success_when_erpnext_connected(self, client, erpnext_client_class):
         """Test health check returns healthy when ERPNext is connected."""
-        with patch("src.main.ERPNextClient") as mock_client_class:
-            mock_instance = MagicMock()
-            mock_client_class.return_value = mock_instance
-            mock_instance.health_check.return_value = True
-            mock_client_class.get_circuit_breaker_status.return_value = {"state": "closed"}
+        response = client.get("/health")
 
-            response = client.get("/health")
-
-            assert response.status_code == 200
-            data = response.json()
-            assert data["status"] == "healthy"
-            assert data["erpnext_connected"] is True
-            assert "operational" in data["message"].lower()
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "healthy"
+        assert data["erpnext_connected"] is True
+        assert "operational" in data["message"].lower()
 
         # Test with circuit breaker open
-        with patch("src.main.ERPNextClient") as mock_client_class:
-            mock_instance = MagicMock()
-            mock_client_class.return_value = mock_instance
-            mock_instance.health_check.return_value = True
-            mock_client_class.get_circuit_breaker_status.return_value = {"state": "open", "failure_count": 5}
-            response = client.get("/health")
-            data = response.json()
-            assert "circuit breaker" in data["message"].lower()
-
-    def test_health_check_degraded_when_erpnext_disconnected(self):
+        erpnext_client_class.get_circuit_breaker_status.return_value = {
+            "state": "open",
+            "failure_count": 5,
+        }
+        response = client.get("/health")
+        data = response.json()
+        assert "circuit breaker" in data["message"].lower()
+
+    def test_health_check_degraded_when_erpnext_disconnected(self, client, erpnext_client_class):
         """Test health check returns degraded when ERPNext is disconnected."""
-        with patch("src.main.ERPNextClient") as mock_client_class:
-            mock_instance = MagicMock()
-            mock_client_class.return_value = mock_instance
-            mock_instance.health_check.return_value = False
-            mock_client_class.get_circuit_breaker_status.return_value = {"state": "closed"}
+        erpnext_client_class.return_value.health_check.return_value = False
 
-            response = client.get("/health")
+        response = client.get("/health")
 
-            assert response.status_code == 200
-            data = response.json()
-            assert data["status"] == "degraded"
-            assert data["erpnext_connected"] is False
-            assert "failed" in data["message"].lower() or "connection" in data["message"].lower()
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "degraded"
+        assert data["erpnext_connected"] is False
+        assert "failed" in data["message"].lower() or "connection" in data["message"].lower()
 
-    def test_health_check_handles_exception(self):
+    def test_health_check_handles_exception(self, client, erpnext_client_class):
         """Test health check handles exceptions gracefully."""
-        with patch("src.main.ERPNextClient") as mock_client_class:
-            mock_client_class.return_value.health_check.side_effect = Exception("Connection error")
-            mock_client_class.get_circuit_breaker_status.return_value = {"state": "closed"}
+        erpnext_client_class.return_value.health_check.side_effect = Exception("Connection error")
 
-            response = client.get("/health")
+        response = client.get("/health")
 
-            assert response.status_code == 200
-            data = response.json()
-            assert data["status"] == "degraded"
-            assert data["erpnext_connected"] is False
-            assert "unreachable" in data["message"].lower() or "error" in data["message"].lower()
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "degraded"
+        assert data["erpnext_connected"] is False
+        assert "unreachable" in data["message"].lower() or "error" in data["message"].lower()
 
 
 class TestGlobalExceptionHandler:
     """Test global exception handler."""
 
-    def test_global_exception_handler_returns_500(self):
+    async def test_global_exception_handler_returns_500(self, aclient):
         """Test that unhandled exceptions return 500 status."""
         # Trigger an exception by requesting a non-existent route with invalid data
         # This is tricky - we need to trigger an exception in a route
         # For now, we'll test the structure indirectly by checking error responses
 
         # Try an endpoint with invalid data that might trigger validation error
-        response = client.post("/otp/promise", json={})
+        response = await aclient.post("/otp/promise", json={})
 
         # Should return 422 for validation error, not 500 (validation is handled)
         assert response.status_code == 422  # Pydantic validation error
 
-    def test_exception_handler_message_format(self):
+    def test_exception_handler_message_format(self, client):
         """Test that exception handler returns proper format."""
         # Test with an invalid endpoint
         response = client.get("/nonexistent/endpoint/path")
@@ -121,18 +116,37 @@ class TestGlobalExceptionHandler:
         data = response.json()
         assert "detail" in data
 
+    def test_global_exception_handler_detail_in_development(self):
+        """Test that error detail is included in development mode."""
+        import asyncio
+        from src.main import global_exception_handler
+        from unittest.mock import MagicMock
+
+        with patch("src.main.settings") as mock_settings:
+            mock_settings.otp_service_env = "development"
+            
+            request = MagicMock()
+            exc = ValueError("Test error")
+
+            async def test_handler():
+                return await global_exception_handler(request, exc)
+
+            result = asyncio.run(test_handler())
+            
+            assert result.status_code == 500
+
 
 class TestCORSMiddleware:
     """Test CORS middleware configuration."""
 
-    def test_cors_headers_present(self):
+    def test_cors_headers_present(self, client):
         """Test that CORS headers are present in responses."""
         response = client.options("/health")
 
         # OPTIONS request should work for CORS preflight
         assert response.status_code in [200, 405]  # 405 if OPTIONS not explicitly handled
 
-    def test_cors_allows_origins(self):
+    def test_cors_allows_origins(self, client, erpnext_client_class):
         """Test that CORS allows configured origins."""
         response = client.get("/health", headers={"Origin": "http://localhost:3000"})
 
@@ -143,57 +157,58 @@ class TestCORSMiddleware:
 class TestRouterInclusion:
     """Test that routers are properly included."""
 
-    def test_otp_router_included(self):
+    def test_otp_router_included(self, openapi_paths):
         """Test that OTP router endpoints are accessible."""
         # Test that /otp/health endpoint exists (from OTP router)
         # Actually, /otp/health might not exist, but /otp/promise should
-        response = client.get("/openapi.json")
-        assert response.status_code == 200
-
-        data = response.json()
-        paths = data.get("paths", {})
-
         # Check that OTP endpoints are registered
-        otp_endpoints = [p for p in paths.keys() if p.startswith("/otp")]
+        otp_endpoints = [p for p in openapi_paths.keys() if p.startswith("/otp")]
         assert len(otp_endpoints) > 0
 
-    def test_demo_data_router_included(self):
+    def test_demo_data_router_included(self, openapi_paths):
         """Test that demo_data router endpoints are accessible."""
-        response = client.get("/openapi.json")
-        assert response.status_code == 200
-
-        data = response.json()
-        paths = data.get("paths", {})
-
         # Check that demo endpoints might be registered
         # Note: demo_data routes might be under /demo or similar
-        all_paths = list(paths.keys())
+        all_paths = list(openapi_paths.keys())
         assert len(all_paths) > 0  # At least some paths should be registered
 
 
 class TestErrorResponseFormats:
     """Test error response formats from various sources."""
 
-    def test_404_not_found_format(self):
+    @pytest.mark.parametrize("path", ["/this/path/does/not/exist", "/otp/nonexistent"])
+    def test_404_not_found_format(self, client, path):
         """Test 404 error response format."""
-        response = client.get("/this/path/does/not/exist")
+        response = client.get(path)
 
         assert response.status_code == 404
         data = response.json()
         assert "detail" in data
 
-    def test_422_validation_error_format(self):
+    async def test_422_validation_error_format(self, aclient):
         """Test 422 validation error response format."""
-        response = client.post("/otp/promise", json={"invalid": "data"})
+        response = await aclient.post("/otp/promise", json={"invalid": "data"})
 
         assert response.status_code == 422
         data = response.json()
         assert "detail" in data
 
-    def test_405_method_not_allowed_format(self):
+    async def test_422_malformed_json_format(self, aclient):
+        """Test that a body that isn't valid JSON is rejected with 422."""
+        response = await aclient.post(
+            "/otp/promise", content=b"not json", headers={"Content-Type": "application/json"}
+        )
+
+        assert response.status_code == 422
+        assert "detail" in response.json()
+
+    @pytest.mark.parametrize(
+        "method,path",
+        [("POST", "/health"), ("PUT", "/otp/promise")],  # GET-only / POST-only endpoints
+    )
+    def test_405_method_not_allowed_format(self, client, method, path):
         """Test 405 method not allowed response format."""
-        # Try POST on a GET-only endpoint
-        response = client.post("/health")
+        response = client.request(method, path)
 
         assert response.status_code == 405
         data = response.json()
@@ -222,74 +237,48 @@ class TestStartupShutdownEvents:
 class TestEndpointRegistration:
     """Test that all expected endpoints are registered."""
 
-    def test_promise_endpoint_registered(self):
+    def test_promise_endpoint_registered(self, openapi_paths):
         """Test that /otp/promise endpoint is registered."""
-        response = client.get("/openapi.json")
-        data = response.json()
-        paths = data.get("paths", {})
+        assert "/otp/promise" in openapi_paths
+        assert "post" in openapi_paths["/otp/promise"]
 
-        assert "/otp/promise" in paths
-        assert "post" in paths["/otp/promise"]
-
-    def test_apply_endpoint_registered(self):
+    def test_apply_endpoint_registered(self, openapi_paths):
         """Test that /otp/apply endpoint is registered."""
-        response = client.get("/openapi.json")
-        data = response.json()
-        paths = data.get("paths", {})
+        assert "/otp/apply" in openapi_paths
+        assert "post" in openapi_paths["/otp/apply"]
 
-        assert "/otp/apply" in paths
-        assert "post" in paths["/otp/apply"]
-
-    def test_sales_orders_endpoint_registered(self):
+    def test_sales_orders_endpoint_registered(self, openapi_paths):
         """Test that /otp/sales-orders endpoint is registered."""
-        response = client.get("/openapi.json")
-        data = response.json()
-        paths = data.get("paths", {})
+        assert "/otp/sales-orders" in openapi_paths
+        assert "get" in openapi_paths["/otp/sales-orders"]
 
-        assert "/otp/sales-orders" in paths
-        assert "get" in paths["/otp/sales-orders"]
-
-    def test_sales_order_details_endpoint_registered(self):
+    def test_sales_order_details_endpoint_registered(self, openapi_paths):
         """Test that /otp/sales-orders/{sales_order_id} endpoint is registered."""
-        response = client.get("/openapi.json")
-        data = response.json()
-        paths = data.get("paths", {})
-
-        assert "/otp/sales-orders/{sales_order_id}" in paths
-        assert "get" in paths["/otp/sales-orders/{sales_order_id}"]
+        assert "/otp/sales-orders/{sales_order_id}" in openapi_paths
+        assert "get" in openapi_paths["/otp/sales-orders/{sales_order_id}"]
 
 
 class TestHealthCheckResponseModel:
     """Test health check response model."""
 
-    def test_health_check_response_has_all_fields(self):
+    def test_health_check_response_has_all_fields(self, client, erpnext_client_class):
         """Test that health check response has all required fields."""
-        with patch("src.main.ERPNextClient") as mock_client_class:
-            mock_instance = MagicMock()
-            mock_client_class.return_value.__enter__.return_value = mock_instance
-            mock_instance.health_check.return_value = True
-
-            response = client.get("/health")
-            data = response.json()
+        response = client.get("/health")
+        data = response.json()
 
-            assert "status" in data
-            assert "version" in data
-            assert "erpnext_connected" in data
-            assert "message" in data
+        assert "status" in data
+        assert "version" in data
+        assert "erpnext_connected" in data
+        assert "message" in data
 
-            assert data["version"] == "0.1.0"
+        assert data["version"] == "0.1.0"
 
-    def test_health_check_version_consistency(self):
+    def test_health_check_version_consistency(self, client, erpnext_client_class):
         """Test that health check version matches app version."""
-        with patch("src.main.ERPNextClient") as mock_client_class:
-            mock_instance = MagicMock()
-            mock_client_class.return_value.__enter__.return_value = mock_instance
-            mock_instance.health_check.return_value = True
-
-            response = client.get("/health")
-            data = response.json()
+        response = client.get("/health")
+        data = response.json()
 
-            assert data["version"] == app.version
+        assert data["version"] == app.version
 
 
 class TestStartupAndShutdownEvents:
@@ -361,29 +350,6 @@ class TestOTPControllerIntegration:
         mock_apply_service.create_procurement_suggestion.assert_called_once()
 
 
-class TestGlobalExceptionHandler:
-    """Test global exception handler."""
-
-    def test_global_exception_handler_detail_in_development(self):
-        """Test that error detail is included in development mode."""
-        import asyncio
-        from src.main import global_exception_handler
-        from unittest.mock import MagicMock
-
-        with patch("src.main.settings") as mock_settings:
-            mock_settings.otp_service_env = "development"
-            
-            request = MagicMock()
-            exc = ValueError("Test error")
-
-            async def test_handler():
-                return await global_exception_handler(request, exc)
-
-            result = asyncio.run(test_handler())
-            
-            assert result.status_code == 500
-
-
 class TestRoutesDependencyInjection:
     """Test routes dependency injection with different settings."""
 
@@ -407,6 +373,7 @@ class TestRoutesDependencyInjection:
     def test_get_controller_with_stock_service_fallback(self):
         """Test that get_controller uses StockService when mock is disabled."""
         from src.routes.otp import get_controller
+        from src.services.stock_service import shared_stock_cache
 
         with patch("src.routes.otp.settings") as mock_settings:
             with patch("src.routes.otp.StockService") as mock_stock_class:
@@ -415,12 +382,13 @@ class TestRoutesDependencyInjection:
                 mock_erpnext_client = MagicMock()
                 controller = get_controller(mock_erpnext_client)
 
-                # Verify StockService was instantiated with the client
-                mock_stock_class.assert_called_once_with(mock_erpnext_client)
+                # Verify StockService was instantiated with the client and the shared cache
+                mock_stock_class.assert_called_once_with(
+                    mock_erpnext_client, cache=shared_stock_cache
+                )
                 assert controller is not None
 
 
-
 class TestRoutesErrorHandling:
     """Test error handling in route endpoints."""
 
@@ -447,7 +415,9 @@ class TestRoutesErrorHandling:
             ),  # Validation error
         ],
     )
-    def test_endpoint_validation_errors(self, endpoint, request_data, status_code, error_detail):
+    async def test_endpoint_validation_errors(
+        self, aclient, endpoint, request_data, status_code, error_detail
+    ):
         """Test that endpoints return 422 for validation errors."""
-        response = client.post(endpoint, json=request_data)
+        response = await aclient.post(endpoint, json=request_data)
         assert response.status_code == status_code
@@ -1,12 +1,17 @@
 """Unit tests for MockSupplyService - consolidated version."""
 import pytest
-from pathlib import Path
 from src.services.mock_supply_service import MockSupplyService
 
 
 pytestmark = pytest.mark.unit
 
 
+@pytest.fixture(scope="module")
+def sales_invoice_supply():
+    """MockSupplyService loaded from the sales invoice CSV once per module (treat as read-only)."""
+    return MockSupplyService("data/Sales Invoice.csv")
+
+
 class TestMockSupplyService:
     """Tests for MockSupplyService integration and edge cases."""
 
@@ -18,9 +23,9 @@ class TestMockSupplyService:
         result = service.get_incoming_supply("ANY-ITEM")
         assert result["supply"] == []
 
-    def test_with_existing_csv_and_queries(self):
+    def test_with_existing_csv_and_queries(self, sales_invoice_supply):
         """Test loading CSV and various queries."""
-        service = MockSupplyService("data/Sales Invoice.csv")
+        service = sales_invoice_supply
         # Verify existing item
         result = service.get_available_stock("SKU001")
         assert isinstance(result, dict)
@@ -31,10 +36,10 @@ class TestMockSupplyService:
         result = service.get_incoming_supply("NON-EXISTENT-ITEM")
         assert result["supply"] == []
 
-    def test_date_filtering_and_warehouse_handling(self):
+    def test_date_filtering_and_warehouse_handling(self, sales_invoice_supply):
         """Test after_date filter and warehouse-specific queries."""
         from datetime import date
-        service = MockSupplyService("data/Sales Invoice.csv")
+        service = sales_invoice_supply
         
         # Test after_date filter
         all_pos = service.get_incoming_supply("SKU001")
@@ -49,9 +54,9 @@ class TestMockSupplyService:
         result = service.get_available_stock("SKU001", warehouse="NON-EXISTENT-WH")
         assert isinstance(result, dict)
 
-    def test_case_insensitive_and_sorting(self):
+    def test_case_insensitive_and_sorting(self, sales_invoice_supply):
         """Test case-insensitive lookup and PO sorting."""
-        service = MockSupplyService("data/Sales Invoice.csv")
+        service = sales_invoice_supply
         
         # Case insensitivity
         r_upper = service.get_available_stock("SKU001")
@@ -96,9 +101,9 @@ class TestMockSupplyServiceParsing:
         })
         assert sum(len(v) for v in service.stock_index.values()) == after_valid
 
-    def test_safe_float_conversion(self):
+    def test_safe_float_conversion(self, sales_invoice_supply):
         """Test _safe_float with all data types and edge cases."""
-        service = MockSupplyService("data/Sales Invoice.csv")
+        service = sales_invoice_supply
         
         # Valid conversions
         assert service._safe_float("42.5") == 42.5
@@ -593,3 +593,75 @@ class TestPromiseServiceEdgeCases:
 
         # Should be on time
         assert response.promise_date <= today + timedelta(days=10)
+
+    @pytest.mark.unit
+    def test_repeated_item_lines_share_lookups(self, today):
+        """Duplicate (item, warehouse) lines in one order hit the stock service once."""
+        from unittest.mock import MagicMock
+
+        stock_service = MagicMock()
+        stock_service.get_available_stock.return_value = {
+            "actual_qty": 0.0,
+            "reserved_qty": 0.0,
+            "available_qty": 0.0,
+        }
+        stock_service.get_incoming_supply.return_value = {"supply": [], "access_error": None}
+        promise_service = PromiseService(stock_service)
+
+        items = [
+            ItemRequest(item_code="ITEM-001", qty=5.0, warehouse="Stores - WH"),
+            ItemRequest(item_code="ITEM-001", qty=3.0, warehouse="Stores - WH"),
+        ]
+        promise_service.calculate_promise(customer="CUST-001", items=items)
+
+        assert stock_service.get_available_stock.call_count == 1
+        assert stock_service.get_incoming_supply.call_count == 1
+
+    @pytest.mark.unit
+    def test_multi_line_order_prefetches_stock_per_line(self, today):
+        """Stock for distinct lines is prefetched once each and used by the matching line."""
+        from unittest.mock import MagicMock
+
+        stock_by_item = {"ITEM-001": 10.0, "ITEM-002": 0.0, "ITEM-003": 4.0}
+        stock_service = MagicMock()
+        stock_service.get_available_stock.side_effect = lambda item_code, warehouse: {
+            "actual_qty": stock_by_item[item_code],
+            "reserved_qty": 0.0,
+            "available_qty": stock_by_item[item_code],
+        }
+        stock_service.get_incoming_supply.return_value = {"supply": [], "access_error": None}
+        promise_service = PromiseService(stock_service)
+
+        items = [
+            ItemRequest(item_code=code, qty=5.0, warehouse="Stores - WH")
+            for code in stock_by_item
+        ]
+        response = promise_service.calculate_promise(customer="CUST-001", items=items)
+
+        assert stock_service.get_available_stock.call_count == 3
+        assert [p.shortage for p in response.plan] == [0.0, 5.0, 1.0]
+
+    @pytest.mark.unit
+    def test_group_warehouse_plans_from_sellable_children(self, mock_erpnext_client, today):
+        """A group line is fulfilled from its sellable children only, allowing processing."""
+        stock_by_warehouse = {
+            "Stores - SD": 4.0,
+            "Finished Goods - SD": 2.0,
+            "Goods In Transit - SD": 50.0,
+            "Work In Progress - SD": 50.0,
+        }
+        mock_erpnext_client.get_bin_details.side_effect = lambda item_code, warehouse: {
+            "actual_qty": stock_by_warehouse[warehouse],
+            "reserved_qty": 0.0,
+        }
+        mock_erpnext_client.get_incoming_purchase_orders.return_value = []
+        promise_service = PromiseService(StockService(mock_erpnext_client))
+
+        item = ItemRequest(item_code="ITEM-001", qty=10.0, warehouse="All Warehouses - SD")
+        response = promise_service.calculate_promise(
+            customer="CUST-001", items=[item], rules=PromiseRules(no_weekends=False)
+        )
+
+        assert response.plan[0].fulfillment[0].qty == 6.0
+        assert response.plan[0].shortage == 4.0
+        assert any("Group warehouse All Warehouses - SD" in r for r in response.reasons)
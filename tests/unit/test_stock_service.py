@@ -1,14 +1,36 @@
 """Unit tests for StockService."""
+import httpx
 import pytest
 from unittest.mock import MagicMock
 from datetime import date
-from src.services.stock_service import StockService
+from src.services.stock_service import StockLookupCache, StockService
 
-from src.clients.erpnext_client import ERPNextClientError
+from src.clients.erpnext_client import ERPNextClient, ERPNextClientError
 
 pytestmark = pytest.mark.unit
 
 
+@pytest.fixture
+def forbidden_po_client():
+    """
+    Real ERPNextClient whose HTTP transport answers every request with 403 Forbidden,
+    as ERPNext does for a user without Purchase Order read permission.
+    Requests sent are recorded in forbidden_po_client.sent.
+    """
+    sent = []
+
+    def handler(request):
+        sent.append(request)
+        return httpx.Response(403, json={"exc_type": "PermissionError"})
+
+    client = ERPNextClient(base_url="http://erpnext.test", api_key="key", api_secret="secret")
+    client.client = httpx.Client(transport=httpx.MockTransport(handler))
+    client.sent = sent
+    yield client
+    client.client.close()
+    ERPNextClient.reset_circuit_breaker()
+
+
 class TestStockServiceGetAvailableStock:
     """Test get_available_stock method."""
 
@@ -114,14 +136,9 @@ class TestStockServiceGetIncomingSupply:
         assert result["supply"] == []
         assert result["access_error"] is None
 
-    def test_get_incoming_supply_permission_error_handled(self):
-        """Test that permission errors are flagged with access_error."""
-        mock_client = MagicMock()
-        error = ERPNextClientError("Permission denied")
-        error.status_code = 403
-        mock_client.get_incoming_purchase_orders.side_effect = error
-
-        service = StockService(mock_client)
+    def test_get_incoming_supply_permission_error_handled(self, forbidden_po_client):
+        """Test that an HTTP 403 from ERPNext is flagged with access_error."""
+        service = StockService(forbidden_po_client)
         result = service.get_incoming_supply("ITEM-001")
 
         # Should return empty supply with access_error set
@@ -202,6 +219,70 @@ class TestStockServiceMultipleWarehouseScenarios:
         assert result1["actual_qty"] == 50.0
         assert result2["actual_qty"] == 50.0
 
+    def test_group_warehouse_sums_children(self):
+        """Test that a group warehouse is summed over its sellable children, skipping failures."""
+        mock_client = MagicMock()
+
+        def bin_details(item_code, warehouse):
+            if warehouse == "Finished Goods - SD":
+                raise ERPNextClientError("Server error")
+            return {"actual_qty": 10.0, "reserved_qty": 2.0}
+
+        mock_client.get_bin_details.side_effect = bin_details
+
+        service = StockService(mock_client)
+        result = service.get_available_stock("ITEM-001", "All Warehouses - SD")
+
+        assert mock_client.get_bin_details.call_count == 2
+        assert result == {"actual_qty": 10.0, "reserved_qty": 2.0, "available_qty": 8.0}
+
+    def test_group_total_excludes_wip_and_in_transit_children(self):
+        """Stock in WIP and in-transit children isn't reported as available for the group."""
+        mock_client = MagicMock()
+        stock_by_warehouse = {
+            "Stores - SD": 10.0,
+            "Finished Goods - SD": 5.0,
+            "Goods In Transit - SD": 100.0,
+            "Work In Progress - SD": 1000.0,
+        }
+        mock_client.get_bin_details.side_effect = lambda item_code, warehouse: {
+            "actual_qty": stock_by_warehouse[warehouse],
+            "reserved_qty": 0.0,
+        }
+
+        service = StockService(mock_client)
+        result = service.get_available_stock("ITEM-001", "All Warehouses - SD")
+
+        assert result == {"actual_qty": 15.0, "reserved_qty": 0.0, "available_qty": 15.0}
+        assert {c.args[1] for c in mock_client.get_bin_details.call_args_list} == {
+            "Stores - SD",
+            "Finished Goods - SD",
+        }
+
+    def test_group_total_with_failed_child_cached_with_negative_ttl(self, monkeypatch):
+        """A group total missing a failed child expires after the short negative TTL."""
+        from src.services import stock_service as stock_module
+        from src.utils import ttl_cache
+
+        now = [1000.0]
+        monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: now[0])
+        mock_client = MagicMock()
+        failing = {"Finished Goods - SD"}
+
+        def bin_details(item_code, warehouse):
+            if warehouse in failing:
+                raise ERPNextClientError("Server error")
+            return {"actual_qty": 10.0, "reserved_qty": 2.0}
+
+        mock_client.get_bin_details.side_effect = bin_details
+        service = StockService(mock_client, cache=StockLookupCache())
+        assert service.get_available_stock("ITEM-001", "All Warehouses - SD")["actual_qty"] == 10.0
+
+        # The child recovers; once the negative TTL lapses the group is recomputed
+        failing.clear()
+        now[0] += stock_module.settings.stock_cache_negative_ttl + 1
+        assert service.get_available_stock("ITEM-001", "All Warehouses - SD")["actual_qty"] == 20.0
+
 
 class TestStockServiceEdgeCases:
     """Test edge cases."""
@@ -340,3 +421,126 @@ class TestStockServiceEdgeCases:
 
         assert len(result["supply"]) == 1
         assert result["supply"][0]["expected_date"] == schedule_date_obj
+
+
+class TestStockServiceCaching:
+    """Test the stock/supply TTL cache."""
+
+    def test_repeated_stock_lookup_hits_cache(self):
+        """Same (item, warehouse) within the TTL queries ERPNext once."""
+        mock_client = MagicMock()
+        mock_client.get_bin_details.return_value = {"actual_qty": 10.0, "reserved_qty": 2.0}
+
+        service = StockService(mock_client, cache=StockLookupCache())
+        first = service.get_available_stock("ITEM-001", "WH-Main")
+        second = service.get_available_stock("ITEM-001", "WH-Main")
+
+        assert first == second
+        assert mock_client.get_bin_details.call_count == 1
+
+    def test_no_cache_queries_every_time(self):
+        """Without a cache, each lookup goes to ERPNext."""
+        mock_client = MagicMock()
+        mock_client.get_bin_details.return_value = {"actual_qty": 10.0, "reserved_qty": 2.0}
+
+        service = StockService(mock_client)
+        service.get_available_stock("ITEM-001", "WH-Main")
+        service.get_available_stock("ITEM-001", "WH-Main")
+
+        assert mock_client.get_bin_details.call_count == 2
+
+    def test_stock_cache_shared_across_instances(self):
+        """A sibling request within the TTL reuses the cached stock."""
+        from src.services.stock_service import shared_stock_cache
+
+        mock_client = MagicMock()
+        mock_client.get_bin_details.return_value = {"actual_qty": 10.0, "reserved_qty": 2.0}
+
+        StockService(mock_client, cache=shared_stock_cache).get_available_stock("ITEM-001", "WH-Main")
+        result = StockService(mock_client, cache=shared_stock_cache).get_available_stock(
+            "ITEM-001", "WH-Main"
+        )
+
+        assert result["available_qty"] == 8.0
+        assert mock_client.get_bin_details.call_count == 1
+
+    def test_stock_cache_disabled_with_zero_ttl(self, monkeypatch):
+        """A TTL of 0 disables the cache."""
+        from src.services import stock_service as stock_module
+
+        monkeypatch.setattr(stock_module.settings, "stock_cache_ttl", 0)
+        mock_client = MagicMock()
+        mock_client.get_bin_details.return_value = {"actual_qty": 10.0, "reserved_qty": 2.0}
+
+        service = StockService(mock_client, cache=StockLookupCache())
+        service.get_available_stock("ITEM-001", "WH-Main")
+        service.get_available_stock("ITEM-001", "WH-Main")
+
+        assert mock_client.get_bin_details.call_count == 2
+
+    def test_supply_cache_keyed_by_after_date(self):
+        """Different after_date values are cached separately."""
+        mock_client = MagicMock()
+        mock_client.get_incoming_purchase_orders.return_value = [
+            {"po_id": "PO-001", "pending_qty": 5, "schedule_date": "2026-02-10", "warehouse": "WH"}
+        ]
+
+        service = StockService(mock_client, cache=StockLookupCache())
+        service.get_incoming_supply("ITEM-001", after_date=date(2026, 2, 1))
+        service.get_incoming_supply("ITEM-001", after_date=date(2026, 2, 1))
+        late = service.get_incoming_supply("ITEM-001", after_date=date(2026, 2, 20))
+
+        assert late["supply"] == []
+        assert mock_client.get_incoming_purchase_orders.call_count == 2
+
+    def test_mutating_results_does_not_alter_cache(self):
+        """Callers get their own copies; editing one doesn't leak into later hits."""
+        mock_client = MagicMock()
+        mock_client.get_bin_details.return_value = {"actual_qty": 10.0, "reserved_qty": 2.0}
+        mock_client.get_incoming_purchase_orders.return_value = [
+            {"po_id": "PO-001", "pending_qty": 5, "schedule_date": "2026-02-10", "warehouse": "WH"}
+        ]
+        service = StockService(mock_client, cache=StockLookupCache())
+
+        stock = service.get_available_stock("ITEM-001", "WH-Main")
+        stock["available_qty"] = 0.0
+        supply = service.get_incoming_supply("ITEM-001")
+        supply["supply"][0]["qty"] = 0
+        supply["supply"].clear()
+        supply["access_error"] = "other_error"
+
+        assert service.get_available_stock("ITEM-001", "WH-Main")["available_qty"] == 8.0
+        again = service.get_incoming_supply("ITEM-001")
+        assert again["access_error"] is None
+        assert [row["qty"] for row in again["supply"]] == [5]
+        assert mock_client.get_bin_details.call_count == 1
+        assert mock_client.get_incoming_purchase_orders.call_count == 1
+
+    def test_supply_sorted_by_expected_date_stable(self):
+        """Supply rows are ordered by date; same-date rows keep ERPNext order."""
+        mock_client = MagicMock()
+        mock_client.get_incoming_purchase_orders.return_value = [
+            {"po_id": "PO-LATE", "pending_qty": 1, "schedule_date": "2026-03-01"},
+            {"po_id": "PO-B", "pending_qty": 2, "schedule_date": "2026-02-10"},
+            {"po_id": "PO-A", "pending_qty": 3, "schedule_date": "2026-02-10"},
+        ]
+
+        result = StockService(mock_client).get_incoming_supply("ITEM-001")
+
+        assert [row["po_id"] for row in result["supply"]] == ["PO-B", "PO-A", "PO-LATE"]
+
+    def test_permission_denied_short_circuits_other_items(self, forbidden_po_client):
+        """After a 403, PO lookups for any item skip ERPNext until the backoff is reset."""
+        from src.services.stock_service import reset_permission_backoff
+
+        service = StockService(forbidden_po_client)
+        first = service.get_incoming_supply("ITEM-001")
+        second = service.get_incoming_supply("ITEM-002")
+
+        assert first["access_error"] == second["access_error"] == "permission_denied"
+        (request,) = forbidden_po_client.sent
+        assert request.url.path == "/api/resource/Purchase Order"
+
+        reset_permission_backoff()
+        assert service.get_incoming_supply("ITEM-003")["access_error"] == "permission_denied"
+        assert len(forbidden_po_client.sent) == 2
@@ -0,0 +1,50 @@
+"""Unit tests for TTLCache."""
+import pytest
+from src.utils import ttl_cache
+from src.utils.ttl_cache import TTLCache
+
+pytestmark = pytest.mark.unit
+
+
+class TestTTLCache:
+    """Test expiry, eviction and dict-style access."""
+
+    def test_entries_expire_after_ttl(self, monkeypatch):
+        """Entries are returned until their TTL elapses, then behave as missing."""
+        now = [1000.0]
+        monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: now[0])
+
+        cache = TTLCache(maxsize=10, ttl=30)
+        cache["a"] = 1
+        cache.set("b", 2, ttl=5)
+
+        now[0] += 10
+        assert cache["a"] == 1
+        assert cache.get("b") is None
+        assert "b" not in cache
+
+        now[0] += 30
+        with pytest.raises(KeyError):
+            cache["a"]
+        assert len(cache) == 0
+
+    def test_full_cache_evicts_oldest_entry(self):
+        """Adding a new key to a full cache evicts the oldest insertion."""
+        cache = TTLCache(maxsize=2, ttl=30)
+        cache["a"] = 1
+        cache["b"] = 2
+        cache["a"] = 10  # Overwriting an existing key never evicts
+        cache["c"] = 3
+
+        assert "a" not in cache
+        assert cache["b"] == 2
+        assert cache["c"] == 3
+
+    def test_non_positive_ttl_skips_store(self):
+        """A TTL of 0 (caching disabled) stores nothing."""
+        cache = TTLCache(maxsize=10, ttl=0)
+        cache["a"] = 1
+        cache.set("b", 2, ttl=-1)
+
+        assert len(cache) == 0
+        assert cache.get("a", "default") == "default"
@@ -54,6 +54,45 @@ class TestWarehouseClassification:
         # Default to SELLABLE
         assert wm.classify_warehouse("Custom Warehouse") == WarehouseType.SELLABLE
 
+    def test_pattern_matching_precedence(self):
+        """Multiple keywords resolve by rule order."""
+        wm = WarehouseManager()
+        assert wm.classify_warehouse("All Transit Bays") == WarehouseType.IN_TRANSIT
+        assert wm.classify_warehouse("Finished-Scrap") == WarehouseType.NEEDS_PROCESSING
+        assert wm.classify_warehouse("Group WIP") == WarehouseType.NOT_AVAILABLE
+        assert wm.classify_warehouse("Grouprogress Rejectransit") == WarehouseType.IN_TRANSIT
+
+    @pytest.mark.parametrize(
+        "name,expected",
+        [
+            ("Scrapyard", WarehouseType.NOT_AVAILABLE),
+            ("Rejects Bin", WarehouseType.NOT_AVAILABLE),
+            ("Rejected Returns", WarehouseType.NOT_AVAILABLE),
+            ("Swipe Card Lockers", WarehouseType.NOT_AVAILABLE),
+            ("Shop Work In Progress", WarehouseType.NOT_AVAILABLE),
+            ("Transitory Hold", WarehouseType.IN_TRANSIT),
+            ("Unfinished Goods", WarehouseType.NEEDS_PROCESSING),
+            ("Hallway Stores", WarehouseType.GROUP),
+            ("Overflow Shed", WarehouseType.SELLABLE),
+        ],
+    )
+    def test_pattern_matching_keywords_match_inside_words(self, name, expected):
+        """Keywords match anywhere in the name, so e.g. scrap yards are never sellable."""
+        assert WarehouseManager().classify_warehouse(name) == expected
+
+    def test_unmapped_names_not_registered_exact_match_wins(self):
+        """Unmapped names are pattern-classified without growing the default tables."""
+        from src.utils.warehouse_utils import default_warehouse_manager as default_wm
+
+        table_size = len(default_wm._tables[0])
+        assert default_wm.classify_warehouse("Transit Dock") == WarehouseType.IN_TRANSIT
+        assert default_wm.expand_warehouse_list(["Transit Dock"]) == ["Transit Dock"]
+        assert len(default_wm._tables[0]) == table_size
+
+        wm = WarehouseManager()
+        wm.classifications["transit dock"] = WarehouseType.SELLABLE
+        assert wm.classify_warehouse("Transit Dock") == WarehouseType.SELLABLE
+
     def test_custom_classifications(self):
         """Test custom warehouse classifications and finished goods/scrap."""
         custom_classifications = {
@@ -148,6 +187,21 @@ class TestWarehouseGroupExpansion:
         assert "Goods In Transit - SD" not in available
         assert "Work In Progress - SD" not in available
 
+    def test_expand_deduplicate_keeps_first_seen_casing(self):
+        """Deduplication is case-insensitive and keeps the first spelling seen."""
+        wm = WarehouseManager()
+        warehouses = ["stores - sd", "All Warehouses - SD", "STORES - SD "]
+        expanded = wm.expand_warehouse_list(warehouses)
+        assert expanded[0] == "stores - sd"
+        assert "Stores - SD" not in expanded
+        assert len(expanded) == 4
+
+    def test_expand_custom_group_and_unknown_warehouses(self):
+        """Custom groups expand to their children; unseen names pass through unchanged."""
+        wm = WarehouseManager(custom_hierarchy={"custom group": ["Bay 1", "Bay 2"]})
+        expanded = wm.expand_warehouse_list(["Overflow Shed", "Custom Group", "bay 1"])
+        assert expanded == ["Overflow Shed", "Bay 1", "Bay 2"]
+
     def test_expand_no_deduplicate(self):
         """Expand list without deduplication keeps duplicates."""
         wm = WarehouseManager()
@@ -167,6 +221,45 @@ class TestWarehouseGroupExpansion:
         assert "Empty Group" not in expanded
         assert "Stores - SD" in expanded
 
+    def test_mapping_changes_after_construction_apply_to_expansion(self):
+        """Edits to hierarchy/classifications reach expand_warehouse_list and classification."""
+        wm = WarehouseManager()
+        wm.hierarchy["bay group"] = ["Bay 1", "Bay 2"]
+        wm.classifications["bay group"] = WarehouseType.GROUP
+        assert wm.expand_warehouse_list(["Bay Group"]) == ["Bay 1", "Bay 2"]
+
+        wm.classifications["stores - sd"] = WarehouseType.GROUP
+        assert wm.is_group_warehouse("Stores - SD")
+        assert wm.expand_warehouse_list(["Stores - SD"]) == []  # Group without children
+
+        del wm.classifications["stores - sd"]
+        wm.hierarchy = {"all warehouses - sd": ["Stores - SD"]}
+        assert wm.expand_warehouse_list(["All Warehouses - SD"]) == ["Stores - SD"]
+        assert wm.classify_warehouse("Stores - SD") == WarehouseType.SELLABLE
+
+        wm.hierarchy["all warehouses - sd"].append("New Store - SD")
+        assert wm.expand_warehouse_list(["All Warehouses - SD"]) == [
+            "Stores - SD",
+            "New Store - SD",
+        ]
+
+    def test_default_manager_matches_fresh_manager_and_is_read_only(self):
+        """The prebuilt default tables expand like a fresh manager, and can't be edited."""
+        from src.utils.warehouse_utils import default_warehouse_manager
+
+        names = ["stores - sd", "All Warehouses - SD", "Overflow Shed", "All Warehouses - WH"]
+        for deduplicate in (True, False):
+            assert default_warehouse_manager.expand_warehouse_list(
+                names, deduplicate=deduplicate
+            ) == WarehouseManager().expand_warehouse_list(names, deduplicate=deduplicate)
+
+        with pytest.raises(TypeError):
+            default_warehouse_manager.classifications["stores - sd"] = WarehouseType.GROUP
+        with pytest.raises(TypeError):
+            default_warehouse_manager.hierarchy["bay group"] = ("Bay 1",)
+        with pytest.raises(AttributeError):
+            default_warehouse_manager.hierarchy["all warehouses - sd"].append("New Store - SD")
+
 
 class TestWarehouseAvailabilityReasons:
     """Test warehouse availability reason generation."""
@@ -31,6 +31,9 @@ ERPNEXT_BASE_URL = os.getenv("ERPNEXT_BASE_URL", "http://localhost:8080")
 ERPNEXT_API_KEY = os.getenv("ERPNEXT_API_KEY")
 ERPNEXT_API_SECRET = os.getenv("ERPNEXT_API_SECRET")
 
+# One session for every step, so calls to each host reuse a keep-alive connection
+session = requests.Session()
+
 
 def print_section(title: str):
     """Print a formatted section header."""
@@ -53,7 +56,7 @@ def step0_list_sales_orders() -> List[Dict[Any, Any]]:
     print_section("Fetching Available Sales Orders")
     print(f"Requesting: GET {BASE_URL}/otp/sales-orders?limit=20")
 
-    response = requests.get(f"{BASE_URL}/otp/sales-orders?limit=20")
+    response = session.get(f"{BASE_URL}/otp/sales-orders?limit=20")
 
     if response.status_code != 200:
         print(f"\n❌ ERROR: Failed to fetch sales orders (status {response.status_code})")
@@ -124,7 +127,7 @@ def step1_fetch_sales_order_details(so_id: str) -> Dict[Any, Any]:
     print_section("STEP 1: Fetch Sales Order Details")
     print(f"Requesting: GET {BASE_URL}/otp/sales-orders/{so_id}")
 
-    response = requests.get(f"{BASE_URL}/otp/sales-orders/{so_id}")
+    response = session.get(f"{BASE_URL}/otp/sales-orders/{so_id}")
 
     if response.status_code == 404:
         print(f"\n❌ ERROR: Sales Order '{so_id}' not found in ERPNext")
@@ -155,7 +158,7 @@ def step1_fetch_sales_order_details(so_id: str) -> Dict[Any, Any]:
         )
         # Fetch incoming POs for this item using parent Purchase Order
         try:
-            po_response = requests.get(
+            po_response = session.get(
                 f"{ERPNEXT_BASE_URL}/api/resource/Purchase Order",
                 params={
                     "filters": json.dumps([
@@ -176,7 +179,7 @@ def step1_fetch_sales_order_details(so_id: str) -> Dict[Any, Any]:
                     # Some ERPNext APIs may not return child tables by default; fetch full doc if needed
                     if not po.get("items"):
                         # Fetch full PO doc
-                        po_doc_resp = requests.get(
+                        po_doc_resp = session.get(
                             f"{ERPNEXT_BASE_URL}/api/resource/Purchase Order/{po['name']}",
                             headers={"Authorization": f"token {ERPNEXT_API_KEY}:{ERPNEXT_API_SECRET}"},
                         )
@@ -238,7 +241,7 @@ def step2_check_stock_levels(so_details: Dict[Any, Any]) -> Dict[str, Dict[str,
 
         try:
             # Call ERPNext API directly to get bin details
-            response = requests.get(
+            response = session.get(
                 f"{ERPNEXT_BASE_URL}/api/resource/Bin",
                 params={
                     "filters": json.dumps(
@@ -335,7 +338,7 @@ def step4_calculate_promise(promise_request: Dict[Any, Any]) -> Dict[Any, Any]:
     print_section("STEP 4: Calculate Promise Date")
     print(f"Requesting: POST {BASE_URL}/otp/promise")
 
-    response = requests.post(
+    response = session.post(
         f"{BASE_URL}/otp/promise",
         json=promise_request,
         headers={"Content-Type": "application/json"},